@@ -1,15 +1,138 @@
 import pygame
 import math
 import random
+import argparse
+import itertools
+import time
+import os
+import zlib
+import numpy as np
+from latency import LatencyProbe
 
-pygame.init()
 width, height = 800, 600
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption("Asteroids")
+ship_radius = 12
+
+# Toroidal distance check (objects wrap around the screen edges)
+def wrapped_overlap(x1, y1, r1, x2, y2, r2):
+    dx = abs(x1 - x2) % width
+    dy = abs(y1 - y2) % height
+    if dx > width / 2: dx = width - dx
+    if dy > height / 2: dy = height - dy
+    return dx * dx + dy * dy <= (r1 + r2) * (r1 + r2)
+
+# Spatial hash: uniform grid over the wrapped 800x600 playfield
+class SpatialHash:
+    def __init__(self, cell_size=64):
+        # Cells tile the screen exactly so cell indices wrap with the world
+        self.cols = max(1, round(width / cell_size))
+        self.rows = max(1, round(height / cell_size))
+        self.cell_w = width / self.cols
+        self.cell_h = height / self.rows
+        self.cells = [[] for _ in range(self.cols * self.rows)]
+        self.bulk = None
+
+    def clear(self):
+        for cell in self.cells:
+            cell.clear()
+        self.bulk = None
+
+    def _cells_for(self, x, y, r):
+        c0, c1 = math.floor((x - r) / self.cell_w), math.floor((x + r) / self.cell_w)
+        r0, r1 = math.floor((y - r) / self.cell_h), math.floor((y + r) / self.cell_h)
+        c1 = min(c1, c0 + self.cols - 1)
+        r1 = min(r1, r0 + self.rows - 1)
+        for row in range(r0, r1 + 1):
+            base = (row % self.rows) * self.cols
+            for col in range(c0, c1 + 1):
+                yield base + col % self.cols
+
+    # Objects straddling a wrap edge land in the cells on both sides
+    def insert(self, item, x, y, r):
+        entry = (item, x, y, r)
+        for index in self._cells_for(x, y, r):
+            self.cells[index].append(entry)
+
+    def query(self, x, y, r):
+        hits = []
+        seen = set()
+        for index in self._cells_for(x, y, r):
+            for item, ix, iy, ir in self.cells[index]:
+                if item in seen:
+                    continue
+                seen.add(item)
+                if wrapped_overlap(x, y, r, ix, iy, ir):
+                    hits.append(item)
+        if self.bulk is not None:
+            hits.extend(self._query_bulk(x, y, r))
+        return hits
+
+    # Bulk insert for the NumPy backend: items are array indices, and the
+    # cells are kept as a sorted index array instead of Python lists
+    def insert_arrays(self, xs, ys, rs, ids):
+        c0 = np.floor((xs - rs) / self.cell_w).astype(np.int64)
+        c1 = np.floor((xs + rs) / self.cell_w).astype(np.int64)
+        r0 = np.floor((ys - rs) / self.cell_h).astype(np.int64)
+        r1 = np.floor((ys + rs) / self.cell_h).astype(np.int64)
+        span = int(max((c1 - c0).max(initial=0), (r1 - r0).max(initial=0))) + 1
+        cells, items = [], []
+        for oy in range(min(span, self.rows)):
+            for ox in range(min(span, self.cols)):
+                mask = (c0 + ox <= c1) & (r0 + oy <= r1)
+                idx = np.nonzero(mask)[0]
+                cells.append(((r0[idx] + oy) % self.rows) * self.cols + (c0[idx] + ox) % self.cols)
+                items.append(idx)
+        cells = np.concatenate(cells)
+        items = np.concatenate(items)
+        order = np.argsort(cells, kind="stable")
+        starts = np.searchsorted(cells[order], np.arange(self.cols * self.rows + 1))
+        self.bulk = (items[order], starts, xs, ys, rs, ids)
+
+    def _query_bulk(self, x, y, r):
+        items, starts, xs, ys, rs, ids = self.bulk
+        cells = set(self._cells_for(x, y, r))
+        candidates = np.unique(np.concatenate([items[starts[c]:starts[c + 1]] for c in cells]))
+        dx = np.abs(xs[candidates] - x) % width
+        dy = np.abs(ys[candidates] - y) % height
+        dx = np.minimum(dx, width - dx)
+        dy = np.minimum(dy, height - dy)
+        reach = rs[candidates] + r
+        return ids[candidates[dx * dx + dy * dy <= reach * reach]].tolist()
+
+# Reference O(n) per query check, used by the benchmark
+def brute_force_query(asteroids, x, y, r):
+    return [a for a in asteroids if wrapped_overlap(x, y, r, a.x, a.y, a.size)]
+
+# Ship outline around (x, y); the nose sits ship_reach pixels out
+ship_reach = 20
+
+def ship_points(x, y, angle):
+    return [
+        (x + 20 * math.cos(math.radians(angle)), y - 20 * math.sin(math.radians(angle))),
+        (x - 10 * math.cos(math.radians(angle + 120)), y + 10 * math.sin(math.radians(angle + 120))),
+        (x - 10 * math.cos(math.radians(angle - 120)), y + 10 * math.sin(math.radians(angle - 120)))
+    ]
+
+# Pre-rendered ship sprites, one per 5 degree step (72 in total), built lazily
+sprite_step = 5
+ship_sprites = {}
+
+def ship_sprite(angle):
+    key = int(angle) % 360 // sprite_step
+    sprite = ship_sprites.get(key)
+    if sprite is None:
+        side = 2 * ship_reach + 1
+        sprite = pygame.Surface((side, side))
+        sprite.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+        pygame.draw.polygon(sprite, (255, 255, 255), ship_points(ship_reach, ship_reach, key * sprite_step))
+        ship_sprites[key] = sprite
+    return sprite
 
 # Spaceship
 class Ship:
     def __init__(self):
+        self.reset()
+
+    def reset(self):
         self.x, self.y = width//2, height//2
         self.angle = 0
         self.speed = 0
@@ -23,69 +146,631 @@ class Ship:
         if self.y < 0: self.y += height
         if self.y > height: self.y -= height
 
-    def draw(self):
-        points = [
-            (self.x + 20 * math.cos(math.radians(self.angle)), self.y - 20 * math.sin(math.radians(self.angle))),
-            (self.x - 10 * math.cos(math.radians(self.angle + 120)), self.y + 10 * math.sin(math.radians(self.angle + 120))),
-            (self.x - 10 * math.cos(math.radians(self.angle - 120)), self.y + 10 * math.sin(math.radians(self.angle - 120)))
-        ]
-        pygame.draw.polygon(screen, (255, 255, 255), points)
+    def draw(self, screen):
+        # Controls turn in whole sprite steps; any other angle is drawn directly
+        if self.angle % sprite_step == 0:
+            return screen.blit(ship_sprite(self.angle), (round(self.x) - ship_reach, round(self.y) - ship_reach))
+        return pygame.draw.polygon(screen, (255, 255, 255), ship_points(self.x, self.y, self.angle))
+
+# Asteroid sizes: large rocks split into medium, medium into small
+asteroid_sizes = (30, 15, 8)
+fragments_per_split = 2
+# Most live rocks one large rock can turn into (all of its small fragments)
+fragments_per_rock = fragments_per_split ** (len(asteroid_sizes) - 1)
+
+def fragment_velocities(dx, dy, rng=random):
+    speed = max(math.hypot(dx, dy), 1) * 1.5
+    heading = math.atan2(dy, dx)
+    for i in range(fragments_per_split):
+        spread = (i - (fragments_per_split - 1) / 2) + rng.uniform(-0.3, 0.3)
+        yield speed * math.cos(heading + spread), speed * math.sin(heading + spread)
 
 # Asteroid
 class Asteroid:
-    def __init__(self):
-        self.x = random.randint(0, width)
-        self.y = random.randint(0, height)
-        self.dx = random.uniform(-2, 2)
-        self.dy = random.uniform(-2, 2)
-        self.size = 30
+    def __init__(self, rng=random):
+        self.x = rng.randint(0, width)
+        self.y = rng.randint(0, height)
+        self.dx = rng.uniform(-2, 2)
+        self.dy = rng.uniform(-2, 2)
+        self.size = asteroid_sizes[0]
+        self.alive = True
+        self.slot = -1
 
-    def move(self):
+    def spawn(self, x, y, dx, dy, size):
+        self.x, self.y = x, y
+        self.dx, self.dy = dx, dy
+        self.size = size
+        self.alive = True
+
+    def move(self, grid=None):
         self.x += self.dx
         self.y += self.dy
         if self.x < 0: self.x += width
         if self.x > width: self.x -= width
         if self.y < 0: self.y += height
         if self.y > height: self.y -= height
+        if grid is not None:
+            grid.insert(self, self.x, self.y, self.size)
 
-    def draw(self):
+    def draw(self, screen):
         pygame.draw.circle(screen, (255, 255, 255), (int(self.x), int(self.y)), self.size)
 
-ship = Ship()
-asteroids = [Asteroid() for _ in range(5)]
-running = True
-clock = pygame.time.Clock()
-
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-    # Controls
-    keys = pygame.key.get_pressed()
-    if keys[pygame.K_LEFT]:
-        ship.angle += 5
-    if keys[pygame.K_RIGHT]:
-        ship.angle -= 5
-    if keys[pygame.K_UP]:
-        ship.speed = 5
-        ship.dx = ship.speed * math.cos(math.radians(ship.angle))
-        ship.dy = -ship.speed * math.sin(math.radians(ship.angle))
-    else:
-        ship.speed = 0
-        ship.dx = ship.dy = 0
+# Asteroid backends. Both preallocate `capacity` rocks and recycle them through
+# a free list, so a wave of explosions never allocates mid-frame.
+class AsteroidStore:
+    def __init__(self, capacity, rng):
+        self.capacity = capacity
+        self.rng = rng
+        self.live = 0
+        self.high_water = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.live
+
+    def _claimed(self, count):
+        self.live += count
+        self.high_water = max(self.high_water, self.live)
+
+    def stats(self):
+        return {"live": self.live, "capacity": self.capacity,
+                "high_water": self.high_water, "dropped": self.dropped}
+
+    # Destroy a rock and spawn its fragments; small rocks just disappear
+    def split(self, item):
+        if not self.is_alive(item):
+            return
+        x, y, dx, dy, size = self.state(item)
+        self.destroy(item)
+        level = asteroid_sizes.index(size)
+        if level + 1 < len(asteroid_sizes):
+            for fdx, fdy in fragment_velocities(dx, dy, self.rng):
+                self.spawn(x, y, fdx, fdy, asteroid_sizes[level + 1])
+
+# A pool of Asteroid objects; live ones are kept densely in `active`
+class AsteroidPool(AsteroidStore):
+    def __init__(self, count, capacity=None, rng=random):
+        super().__init__(capacity or count * fragments_per_rock, rng)
+        self.free = [Asteroid(rng) for _ in range(self.capacity)]
+        self.active = []
+        self.spawn_wave(count)
+
+    def spawn_wave(self, count):
+        for _ in range(min(count, len(self.free))):
+            asteroid = self.free.pop()
+            asteroid.__init__(self.rng)
+            self._activate(asteroid)
+
+    def spawn(self, x, y, dx, dy, size):
+        if not self.free:
+            self.dropped += 1
+            return None
+        asteroid = self.free.pop()
+        asteroid.spawn(x, y, dx, dy, size)
+        self._activate(asteroid)
+        return asteroid
+
+    def _activate(self, asteroid):
+        asteroid.slot = len(self.active)
+        self.active.append(asteroid)
+        self._claimed(1)
+
+    def destroy(self, asteroid):
+        # Swap-remove keeps `active` dense without shifting the list
+        last = self.active.pop()
+        if last is not asteroid:
+            self.active[asteroid.slot] = last
+            last.slot = asteroid.slot
+        asteroid.alive = False
+        self.free.append(asteroid)
+        self.live -= 1
+
+    def is_alive(self, asteroid):
+        return asteroid.alive
+
+    def state(self, asteroid):
+        return asteroid.x, asteroid.y, asteroid.dx, asteroid.dy, asteroid.size
+
+    def move(self, grid=None):
+        for asteroid in self.active:
+            asteroid.move(grid)
+
+    def positions(self):
+        active = self.active
+        return (np.fromiter((a.x for a in active), np.float64, len(active)),
+                np.fromiter((a.y for a in active), np.float64, len(active)),
+                np.fromiter((a.size for a in active), np.int32, len(active)))
+
+    def draw(self, screen):
+        for asteroid in self.active:
+            asteroid.draw(screen)
+
+# Structure-of-arrays backend: one NumPy array per field, `alive` marks used slots
+class AsteroidField(AsteroidStore):
+    def __init__(self, count, capacity=None, rng=random):
+        super().__init__(capacity or count * fragments_per_rock, rng)
+        self.np_rng = np.random.default_rng(rng.getrandbits(64))
+        self.x = np.zeros(self.capacity)
+        self.y = np.zeros(self.capacity)
+        self.dx = np.zeros(self.capacity)
+        self.dy = np.zeros(self.capacity)
+        self.size = np.zeros(self.capacity, dtype=np.int32)
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self.free = list(range(self.capacity - 1, -1, -1))
+        self.spawn_wave(count)
+
+    def spawn_wave(self, count):
+        count = min(count, len(self.free))
+        slots = np.array([self.free.pop() for _ in range(count)], dtype=np.intp)
+        self.x[slots] = self.np_rng.integers(0, width + 1, count)
+        self.y[slots] = self.np_rng.integers(0, height + 1, count)
+        self.dx[slots] = self.np_rng.uniform(-2, 2, count)
+        self.dy[slots] = self.np_rng.uniform(-2, 2, count)
+        self.size[slots] = asteroid_sizes[0]
+        self.alive[slots] = True
+        self._claimed(count)
+
+    def spawn(self, x, y, dx, dy, size):
+        if not self.free:
+            self.dropped += 1
+            return None
+        i = self.free.pop()
+        self.x[i], self.y[i], self.dx[i], self.dy[i], self.size[i] = x, y, dx, dy, size
+        self.alive[i] = True
+        self._claimed(1)
+        return i
+
+    def destroy(self, i):
+        self.alive[i] = False
+        self.free.append(i)
+        self.live -= 1
+
+    def is_alive(self, i):
+        return self.alive[i]
+
+    def state(self, i):
+        return float(self.x[i]), float(self.y[i]), float(self.dx[i]), float(self.dy[i]), int(self.size[i])
+
+    # Free slots are integrated too: the cost stays flat and they are never read
+    def move(self, grid=None):
+        self.x += self.dx
+        self.y += self.dy
+        np.mod(self.x, width, out=self.x)
+        np.mod(self.y, height, out=self.y)
+        if grid is not None:
+            live = np.flatnonzero(self.alive)
+            grid.insert_arrays(self.x[live], self.y[live], self.size[live], live)
+
+    def positions(self):
+        live = np.flatnonzero(self.alive)
+        return self.x[live], self.y[live], self.size[live]
+
+    def draw(self, screen):
+        live = np.flatnonzero(self.alive)
+        for x, y, size in zip(self.x[live].astype(np.int32).tolist(), self.y[live].astype(np.int32).tolist(),
+                              self.size[live].tolist()):
+            pygame.draw.circle(screen, (255, 255, 255), (x, y), size)
+
+# Bullets live in a fixed-capacity ring buffer. Every bullet has the same
+# lifetime, so expiry is a mask update and firing overwrites the oldest slot.
+bullet_speed = 10
+bullet_radius = 2
+bullet_lifetime = 50
 
-    # Update
-    ship.move()
-    for asteroid in asteroids:
-        asteroid.move()
+class Bullets:
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.dx = np.zeros(capacity)
+        self.dy = np.zeros(capacity)
+        self.born = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.head = 0
+        self.frame = 0
+        self.overwritten = 0
 
-    # Draw
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    def fire(self, x, y, angle):
+        i = self.head
+        if self.alive[i]:
+            self.overwritten += 1
+        self.x[i], self.y[i] = x, y
+        self.dx[i] = bullet_speed * math.cos(math.radians(angle))
+        self.dy[i] = -bullet_speed * math.sin(math.radians(angle))
+        self.born[i] = self.frame
+        self.alive[i] = True
+        self.head = (i + 1) % self.capacity
+
+    def move(self):
+        self.frame += 1
+        self.x += self.dx
+        self.y += self.dy
+        np.mod(self.x, width, out=self.x)
+        np.mod(self.y, height, out=self.y)
+        self.alive &= self.frame - self.born < bullet_lifetime
+
+    # Test every live bullet against the asteroids filed in `grid`. Bullets
+    # that hit something are spent; the rocks they hit are added to `hits`
+    # (a dict used as an ordered set) for the caller to split afterwards.
+    def collide(self, grid, hits):
+        live = np.flatnonzero(self.alive)
+        for i, x, y in zip(live.tolist(), self.x[live].tolist(), self.y[live].tolist()):
+            found = grid.query(x, y, bullet_radius)
+            if found:
+                self.alive[i] = False
+                hits.update(dict.fromkeys(found))
+
+    def positions(self):
+        live = np.flatnonzero(self.alive)
+        return self.x[live], self.y[live]
+
+    def draw(self, screen):
+        live = np.flatnonzero(self.alive)
+        for x, y in zip(self.x[live].astype(np.int32).tolist(), self.y[live].astype(np.int32).tolist()):
+            pygame.draw.circle(screen, (255, 255, 255), (x, y), bullet_radius)
+
+backends = {"objects": AsteroidPool, "numpy": AsteroidField}
+
+# Renderers. DrawRenderer is the original one draw call per object;
+# BlitRenderer pre-renders each sprite once and submits the frame in a single
+# Surface.blits call. Both time their draw phase (fill to last blit).
+class DrawRenderer:
+    def __init__(self):
+        self.draw_time = 0.0
+        self.frames = 0
+
+    def draw(self, screen, ship, asteroids, bullets):
+        start = time.perf_counter()
+        screen.fill((0, 0, 0))
+        ship.draw(screen)
+        asteroids.draw(screen)
+        bullets.draw(screen)
+        self.draw_time += time.perf_counter() - start
+        self.frames += 1
+
+    # Mean draw-phase milliseconds per frame since the last call
+    def take_draw_ms(self):
+        ms = self.draw_time * 1000 / max(self.frames, 1)
+        self.draw_time, self.frames = 0.0, 0
+        return ms
+
+def circle_sprite(radius):
+    sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1))
+    sprite.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+    pygame.draw.circle(sprite, (255, 255, 255), (radius, radius), radius)
+    return sprite
+
+# Top-left blit positions for sprites of radius r centred on (xs, ys), plus
+# the extra copies of any that straddle a wrap edge
+def wrapped_positions(xs, ys, r):
+    xs = xs.astype(np.int32) - r
+    ys = ys.astype(np.int32) - r
+    side = 2 * r
+    edge = (xs < 0) | (xs + side >= width) | (ys < 0) | (ys + side >= height)
+    if not edge.any():
+        return zip(xs.tolist(), ys.tolist())
+    out_x, out_y = [xs], [ys]
+    ex, ey = xs[edge], ys[edge]
+    for ox in (-width, 0, width):
+        for oy in (-height, 0, height):
+            if ox == oy == 0:
+                continue
+            cx, cy = ex + ox, ey + oy
+            seen = (cx + side >= 0) & (cx < width) & (cy + side >= 0) & (cy < height)
+            if seen.any():
+                out_x.append(cx[seen])
+                out_y.append(cy[seen])
+    return zip(np.concatenate(out_x).tolist(), np.concatenate(out_y).tolist())
+
+class BlitRenderer(DrawRenderer):
+    def __init__(self):
+        super().__init__()
+        self.asteroid_sprites = {size: circle_sprite(size) for size in asteroid_sizes}
+        self.bullet_sprite = circle_sprite(bullet_radius)
+
+    # With `dirty`, only last frame's rects are erased and the drawn rects are returned
+    def draw(self, screen, ship, asteroids, bullets, dirty=None):
+        start = time.perf_counter()
+        if dirty is None:
+            screen.fill((0, 0, 0))
+        else:
+            dirty.erase(screen)
+        batch = []
+        xs, ys, sizes = asteroids.positions()
+        for size, sprite in self.asteroid_sprites.items():
+            mask = sizes == size
+            batch.extend(zip(itertools.repeat(sprite), wrapped_positions(xs[mask], ys[mask], size)))
+        xs, ys = bullets.positions()
+        batch.extend(zip(itertools.repeat(self.bullet_sprite), wrapped_positions(xs, ys, bullet_radius)))
+        rects = []
+        if ship.angle % sprite_step == 0:
+            sprite = ship_sprite(ship.angle)
+            batch.extend(zip(itertools.repeat(sprite),
+                             wrapped_positions(np.array([round(ship.x)]), np.array([round(ship.y)]), ship_reach)))
+        else:
+            rects.append(ship.draw(screen))
+        if dirty is None:
+            screen.blits(batch, doreturn=False)
+        else:
+            rects.extend(screen.blits(batch))
+        self.draw_time += time.perf_counter() - start
+        self.frames += 1
+        return rects
+
+# Merge overlapping rects so each screen area is pushed to the display once
+def merge_rects(rects):
+    merged = []
+    for rect in rects:
+        if not (rect.w and rect.h):
+            continue
+        rect = rect.copy()
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged[i])
+            merged[i] = merged[-1]
+            merged.pop()
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+# Dirty-rect display updates: erase what was drawn last frame, then push only
+# the previous and current rects. Falls back to a full flip once the dirty
+# area covers more than `max_fraction` of the screen.
+class DirtyRects:
+    def __init__(self, max_fraction=0.5):
+        self.max_fraction = max_fraction
+        self.previous = []
+        self.full_updates = 0
+        self.partial_updates = 0
+
+    def erase(self, screen):
+        for rect in self.previous:
+            screen.fill((0, 0, 0), rect)
+
+    def present(self, rects):
+        dirty = merge_rects(self.previous + rects)
+        self.previous = rects
+        if sum(rect.w * rect.h for rect in dirty) > self.max_fraction * width * height:
+            pygame.display.flip()
+            self.full_updates += 1
+        else:
+            pygame.display.update(dirty)
+            self.partial_updates += 1
+
+renderers = {"draw": DrawRenderer, "blit": BlitRenderer}
+
+# Draw-phase benchmark: per-object draw calls vs one batched blit (headless)
+def benchmark_renderers(counts=(100, 1000, 10000), frames=120):
+    screen = pygame.Surface((width, height))
+    ship = Ship()
+    bullets = Bullets()
+    for angle in range(0, 360, 3):
+        bullets.fire(width / 2, height / 2, angle)
+    print(f"{'asteroids':>10} {'draw ms':>10} {'blit ms':>10}")
+    for count in counts:
+        asteroids = AsteroidField(count)
+        row = []
+        for renderer in (DrawRenderer(), BlitRenderer()):
+            for _ in range(frames):
+                renderer.draw(screen, ship, asteroids, bullets)
+            row.append(renderer.take_draw_ms())
+        print(f"{count:>10} {row[0]:>10.2f} {row[1]:>10.2f}")
+
+# Collision benchmark: spatial hash vs brute force (headless)
+def benchmark_collisions(counts=(100, 1000, 10000), probes=200, frames=5):
+    random.seed(1)
+    print(f"{'asteroids':>10} {'brute ms':>10} {'hash ms':>10} {'speedup':>8}")
+    for count in counts:
+        asteroids = [Asteroid() for _ in range(count)]
+        # One ship plus a burst of bullets per frame
+        points = [(random.uniform(0, width), random.uniform(0, height), ship_radius if i == 0 else 2)
+                  for i in range(probes)]
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            brute = [brute_force_query(asteroids, x, y, r) for x, y, r in points]
+        brute_ms = (time.perf_counter() - start) * 1000 / frames
+
+        grid = SpatialHash()
+        start = time.perf_counter()
+        for _ in range(frames):
+            grid.clear()
+            for asteroid in asteroids:
+                grid.insert(asteroid, asteroid.x, asteroid.y, asteroid.size)
+            hashed = [grid.query(x, y, r) for x, y, r in points]
+        hash_ms = (time.perf_counter() - start) * 1000 / frames
+
+        assert all(set(map(id, a)) == set(map(id, b)) for a, b in zip(brute, hashed))
+        print(f"{count:>10} {brute_ms:>10.2f} {hash_ms:>10.2f} {brute_ms / hash_ms:>7.1f}x")
+
+# Update-phase benchmark: object list vs NumPy field (headless)
+def benchmark_backends(counts=(100, 1000, 10000, 100000), frames=60):
+    print(f"{'asteroids':>10} {'objects ms':>11} {'numpy ms':>10}")
+    for count in counts:
+        row = []
+        for backend in (AsteroidPool, AsteroidField):
+            asteroids = backend(count)
+            grid = SpatialHash()
+            start = time.perf_counter()
+            for _ in range(frames):
+                grid.clear()
+                asteroids.move(grid)
+                grid.query(width / 2, height / 2, ship_radius)
+            row.append((time.perf_counter() - start) * 1000 / frames)
+        print(f"{count:>10} {row[0]:>11.2f} {row[1]:>10.2f}")
+
+# The whole simulation, advanced one frame per step(). `inputs` is any
+# collection of "left", "right", "thrust" and "fire"; a seed makes runs repeatable.
+class Game:
+    def __init__(self, backend="objects", count=5, capacity=None, fire_delay=5, seed=None):
+        self.rng = random.Random(seed)
+        self.ship = Ship()
+        self.bullets = Bullets()
+        self.asteroids = backends[backend](count, capacity, self.rng)
+        self.grid = SpatialHash()
+        self.count = count
+        self.fire_delay = fire_delay
+        self.frame = 0
+        self.last_shot = -fire_delay
+        self.ship_hits = 0
+
+    def step(self, inputs=()):
+        ship = self.ship
+
+        # Controls
+        if "left" in inputs:
+            ship.angle += 5
+        if "right" in inputs:
+            ship.angle -= 5
+        if "thrust" in inputs:
+            ship.speed = 5
+            ship.dx = ship.speed * math.cos(math.radians(ship.angle))
+            ship.dy = -ship.speed * math.sin(math.radians(ship.angle))
+        else:
+            ship.speed = 0
+            ship.dx = ship.dy = 0
+        if "fire" in inputs and self.frame - self.last_shot >= self.fire_delay:
+            nose_x, nose_y = ship_points(ship.x, ship.y, ship.angle)[0]
+            self.bullets.fire(nose_x, nose_y, ship.angle)
+            self.last_shot = self.frame
+
+        # Update
+        ship.move()
+        self.bullets.move()
+        self.grid.clear()
+        self.asteroids.move(self.grid)
+
+        # Collisions. Rocks are only split once every query is done: a split
+        # frees the rock's slot and its first fragment reuses it, so a later
+        # query against this frame's grid would hit the fragment instead.
+        hits = dict.fromkeys(self.grid.query(ship.x, ship.y, ship_radius))
+        if hits:
+            ship.reset()
+            self.ship_hits += 1
+        self.bullets.collide(self.grid, hits)
+        for hit in hits:
+            self.asteroids.split(hit)
+        if not len(self.asteroids):
+            self.asteroids.spawn_wave(self.count)
+        self.frame += 1
+
+    # Fingerprint of the positions of everything on screen, for comparing runs
+    def checksum(self):
+        xs, ys, sizes = self.asteroids.positions()
+        bx, by = self.bullets.positions()
+        state = np.concatenate([[self.ship.x, self.ship.y, self.ship.angle], xs, ys, sizes, bx, by])
+        return zlib.crc32(np.round(state, 6).tobytes())
+
+def main(backend="objects", count=5, capacity=None, fire_delay=5, renderer="blit", display="flip", seed=None,
+         input_latency=False):
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption("Asteroids")
+
+    game = Game(backend, count, capacity, fire_delay, seed)
+    renderer_name, renderer = renderer, renderers[renderer]()
+    dirty = DirtyRects() if display == "dirty" else None
     screen.fill((0, 0, 0))
-    ship.draw()
-    for asteroid in asteroids:
-        asteroid.draw()
     pygame.display.flip()
-    clock.tick(60)
+    running = True
+    clock = pygame.time.Clock()
+    controls = {pygame.K_LEFT: "left", pygame.K_RIGHT: "right", pygame.K_UP: "thrust", pygame.K_SPACE: "fire"}
+    probe = LatencyProbe(controls) if input_latency else None
+
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if probe:
+                probe.on_event(event)
+
+        keys = pygame.key.get_pressed()
+        game.step({action for key, action in controls.items() if keys[key]})
+        if probe:
+            probe.consume(game.frame)
+
+        # Draw
+        if dirty is None:
+            renderer.draw(screen, game.ship, game.asteroids, game.bullets)
+            pygame.display.flip()
+        else:
+            dirty.present(renderer.draw(screen, game.ship, game.asteroids, game.bullets, dirty))
+        if probe:
+            probe.presented()
+        clock.tick(60)
+        if game.frame % 60 == 0:
+            pool = game.asteroids.stats()
+            pygame.display.set_caption(f"Asteroids - {backend}/{renderer_name} - {clock.get_fps():.0f} FPS - "
+                                       f"draw {renderer.take_draw_ms():.2f} ms - "
+                                       f"pool {pool['live']}/{pool['capacity']} peak {pool['high_water']}")
 
-pygame.quit()
+    pygame.quit()
+    if probe:
+        print(probe.report())
+
+# Headless run on SDL's dummy video driver with no frame cap. Inputs come from
+# a second seeded RNG, so the same seed always plays the same game.
+def run_headless(frames=10000, backend="objects", count=5, capacity=None, fire_delay=5,
+                 seed=0, renderer=None):
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.init()
+    screen = pygame.display.set_mode((width, height)) if renderer else None
+    renderer = renderers[renderer]() if renderer else None
+    game = Game(backend, count, capacity, fire_delay, seed)
+    input_rng = random.Random(seed + 1)
+    actions = ("left", "right", "thrust", "fire")
+    inputs = set()
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        # Hold each input for a few frames, like a player would
+        if game.frame % 8 == 0:
+            inputs = {action for action in actions if input_rng.random() < 0.4}
+        game.step(inputs)
+        if renderer:
+            renderer.draw(screen, game.ship, game.asteroids, game.bullets)
+    elapsed = time.perf_counter() - start
+    pygame.quit()
+
+    pool = game.asteroids.stats()
+    print(f"{frames} frames in {elapsed:.2f}s: {frames / elapsed:.0f} frames/s "
+          f"({frames / elapsed / 60:.1f}x real time)")
+    print(f"ship hits {game.ship_hits}, pool {pool['live']}/{pool['capacity']} "
+          f"peak {pool['high_water']} dropped {pool['dropped']}")
+    print(f"checksum {game.checksum():08x}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Asteroids")
+    parser.add_argument("--backend", choices=sorted(backends), default="objects")
+    parser.add_argument("--asteroids", type=int, default=5)
+    parser.add_argument("--pool", type=int, default=None, help="asteroid pool capacity")
+    parser.add_argument("--fire-delay", type=int, default=5, help="frames between shots")
+    parser.add_argument("--renderer", choices=sorted(renderers), default="blit")
+    parser.add_argument("--display", choices=["flip", "dirty"], default="flip",
+                        help="full flip every frame, or push only dirty rects")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--input-latency", action="store_true", help="print input-to-photon latency on exit")
+    parser.add_argument("--headless", type=int, metavar="FRAMES", default=None,
+                        help="run FRAMES seeded frames without a window or frame cap")
+    parser.add_argument("--headless-render", action="store_true", help="also render each headless frame")
+    parser.add_argument("--bench-collisions", action="store_true")
+    parser.add_argument("--bench-backends", action="store_true")
+    parser.add_argument("--bench-render", action="store_true")
+    args = parser.parse_args()
+    if args.display == "dirty" and args.renderer != "blit":
+        parser.error("--display dirty needs the blit renderer")
+    if args.bench_collisions:
+        benchmark_collisions()
+    elif args.bench_backends:
+        benchmark_backends()
+    elif args.bench_render:
+        benchmark_renderers()
+    elif args.headless is not None:
+        run_headless(args.headless, args.backend, args.asteroids, args.pool, args.fire_delay,
+                     args.seed or 0, args.renderer if args.headless_render else None)
+    else:
+        main(args.backend, args.asteroids, args.pool, args.fire_delay, args.renderer, args.display, args.seed,
+             args.input_latency)
@@ -1,57 +1,606 @@
 import pygame
+import argparse
+import heapq
+import math
+import random
+import socket
+import struct
+import sys
+import time
+import zlib
+import numpy as np
+from latency import LatencyProbe
 
-pygame.init()
 width, height = 700, 500
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption("Pong")
-
-# Paddles and ball
-paddle_a = pygame.Rect(50, height//2 - 70, 10, 140)
-paddle_b = pygame.Rect(width - 60, height//2 - 70, 10, 140)
-ball = pygame.Rect(width//2 - 15, height//2 - 15, 30, 30)
-ball_speed_x, ball_speed_y = 7, 7
-
-# Game loop
-clock = pygame.time.Clock()
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-    # Move paddles
-    keys = pygame.key.get_pressed()
-    if keys[pygame.K_w] and paddle_a.top > 0:
-        paddle_a.y -= 5
-    if keys[pygame.K_s] and paddle_a.bottom < height:
-        paddle_a.y += 5
-    if keys[pygame.K_UP] and paddle_b.top > 0:
-        paddle_b.y -= 5
-    if keys[pygame.K_DOWN] and paddle_b.bottom < height:
-        paddle_b.y += 5
-
-    # Move ball
-    ball.x += ball_speed_x
-    ball.y += ball_speed_y
-
-    # Ball collisions
-    if ball.top <= 0 or ball.bottom >= height:
-        ball_speed_y *= -1
-    if ball.colliderect(paddle_a) or ball.colliderect(paddle_b):
-        ball_speed_x *= -1
-
-    # Reset ball if out of bounds
-    if ball.left <= 0 or ball.right >= width:
-        ball.center = (width//2, height//2)
-        ball_speed_x *= -1
-
-    # Draw
-    screen.fill((0, 0, 0))
-    pygame.draw.rect(screen, (255, 255, 255), paddle_a)
-    pygame.draw.rect(screen, (255, 255, 255), paddle_b)
-    pygame.draw.ellipse(screen, (255, 255, 255), ball)
-    pygame.draw.aaline(screen, (255, 255, 255), (width//2, 0), (width//2, height))
-    pygame.display.flip()
-    clock.tick(60)
-
-pygame.quit()
+paddle_w, paddle_h = 10, 140
+paddle_a_x, paddle_b_x = 50, width - 60
+ball_size = 30
+paddle_speed = 5
+ball_speed = 7
+max_bounces = 8
+
+# Entry time and axis of a point moving by (vx, vy) into the box [x0, x1] x [y0, y1].
+# Returns (inf, None) if it does not enter within this step.
+def sweep_box(x, y, vx, vy, x0, y0, x1, y1):
+    if vx > 0:
+        tx0, tx1 = (x0 - x) / vx, (x1 - x) / vx
+    elif vx < 0:
+        tx0, tx1 = (x1 - x) / vx, (x0 - x) / vx
+    elif x0 < x < x1:
+        tx0, tx1 = -math.inf, math.inf
+    else:
+        return math.inf, None
+    if vy > 0:
+        ty0, ty1 = (y0 - y) / vy, (y1 - y) / vy
+    elif vy < 0:
+        ty0, ty1 = (y1 - y) / vy, (y0 - y) / vy
+    elif y0 < y < y1:
+        ty0, ty1 = -math.inf, math.inf
+    else:
+        return math.inf, None
+    enter, leave = max(tx0, ty0), min(tx1, ty1)
+    if enter < 0 or enter >= leave:
+        return math.inf, None
+    return enter, "x" if tx0 >= ty0 else "y"
+
+# Ball and paddles as floats: paddle tops, ball top-left, ball velocity in px per frame
+class Pong:
+    def __init__(self):
+        self.paddle_a = height / 2 - paddle_h / 2
+        self.paddle_b = height / 2 - paddle_h / 2
+        self.ball_x = width / 2 - ball_size / 2
+        self.ball_y = height / 2 - ball_size / 2
+        self.ball_vx, self.ball_vy = ball_speed, ball_speed
+
+    def state(self):
+        return self.paddle_a, self.paddle_b, self.ball_x, self.ball_y, self.ball_vx, self.ball_vy
+
+    def restore(self, state):
+        self.paddle_a, self.paddle_b, self.ball_x, self.ball_y, self.ball_vx, self.ball_vy = state
+
+    # Advance by dt frames (1.0 is one 60 Hz frame). Moves are -1 (up), 0 or 1
+    # (down) for each paddle. Returns 1 if the ball went out on B's side, -1 on
+    # A's side, else 0.
+    def step(self, move_a=0, move_b=0, dt=1.0):
+        self.paddle_a = min(max(self.paddle_a + move_a * paddle_speed * dt, 0), height - paddle_h)
+        self.paddle_b = min(max(self.paddle_b + move_b * paddle_speed * dt, 0), height - paddle_h)
+        self.move_ball(dt)
+
+        # Reset ball if out of bounds
+        if self.ball_x <= 0 or self.ball_x + ball_size >= width:
+            point = -1 if self.ball_x <= 0 else 1
+            self.ball_x = width / 2 - ball_size / 2
+            self.ball_y = height / 2 - ball_size / 2
+            self.ball_vx *= -1
+            return point
+        return 0
+
+    # Swept collision: find the earliest wall or paddle contact along the path,
+    # reflect there and spend the rest of the step on the new heading
+    def move_ball(self, t):
+        x, y, vx, vy = self.ball_x, self.ball_y, self.ball_vx, self.ball_vy
+        paddles = ((paddle_a_x, self.paddle_a), (paddle_b_x, self.paddle_b))
+        for _ in range(max_bounces):
+            hit_t, axis = t, None
+            if vy < 0 and -y / vy < hit_t:
+                hit_t, axis = -y / vy, "y"
+            elif vy > 0 and (height - ball_size - y) / vy < hit_t:
+                hit_t, axis = (height - ball_size - y) / vy, "y"
+            for px, py in paddles:
+                # The ball's top-left hits the paddle grown by the ball's size
+                enter, side = sweep_box(x, y, vx, vy, px - ball_size, py - ball_size, px + paddle_w, py + paddle_h)
+                if enter < hit_t:
+                    hit_t, axis = enter, side
+            x += vx * hit_t
+            y += vy * hit_t
+            t -= hit_t
+            if axis is None:
+                break
+            if axis == "x":
+                vx = -vx
+            else:
+                vy = -vy
+        self.ball_x, self.ball_y, self.ball_vx, self.ball_vy = x, y, vx, vy
+
+# Screen rects for a state blended `alpha` of the way from `prev` to `cur`
+def interpolated_rects(prev, cur, alpha):
+    paddle_a, paddle_b, ball_x, ball_y = (p + (c - p) * alpha for p, c in zip(prev[:4], cur[:4]))
+    return (pygame.Rect(paddle_a_x, round(paddle_a), paddle_w, paddle_h),
+            pygame.Rect(paddle_b_x, round(paddle_b), paddle_w, paddle_h),
+            pygame.Rect(round(ball_x), round(ball_y), ball_size, ball_size))
+
+# N independent games advanced in lockstep with NumPy, following exactly the
+# rules of Pong.step (same operations in the same order, so results match).
+class PongBatch:
+    def __init__(self, n, dt=1.0):
+        self.n = n
+        self.dt = dt
+        self.paddle_a = np.full(n, height / 2 - paddle_h / 2)
+        self.paddle_b = np.full(n, height / 2 - paddle_h / 2)
+        self.ball_x = np.full(n, width / 2 - ball_size / 2)
+        self.ball_y = np.full(n, height / 2 - ball_size / 2)
+        self.ball_vx = np.full(n, float(ball_speed))
+        self.ball_vy = np.full(n, float(ball_speed))
+
+    # Rows are (paddle_a, paddle_b, ball_x, ball_y, ball_vx, ball_vy), as in Pong.state()
+    def observe(self):
+        return np.stack([self.paddle_a, self.paddle_b, self.ball_x, self.ball_y, self.ball_vx, self.ball_vy], axis=1)
+
+    # `actions` is an (n, 2) array of paddle moves in {-1, 0, 1}. Returns the
+    # observations, (n, 2) rewards (+1 to the side that scored, -1 to the
+    # other) and done flags for the games where a point ended this step.
+    def step(self, actions):
+        dt = self.dt
+        self.paddle_a = np.minimum(np.maximum(self.paddle_a + actions[:, 0] * paddle_speed * dt, 0), height - paddle_h)
+        self.paddle_b = np.minimum(np.maximum(self.paddle_b + actions[:, 1] * paddle_speed * dt, 0), height - paddle_h)
+        self.move_ball(dt)
+
+        out_a = self.ball_x <= 0
+        done = out_a | (self.ball_x + ball_size >= width)
+        point = np.where(done, np.where(out_a, -1, 1), 0)
+        self.ball_x[done] = width / 2 - ball_size / 2
+        self.ball_y[done] = height / 2 - ball_size / 2
+        self.ball_vx[done] *= -1
+        return self.observe(), np.stack([point, -point], axis=1), done
+
+    def move_ball(self, dt):
+        x, y, vx, vy = self.ball_x, self.ball_y, self.ball_vx, self.ball_vy
+        t = np.full(self.n, dt)
+        active = np.ones(self.n, dtype=bool)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for _ in range(max_bounces):
+                # axis: 0 for no contact, 1 for an x reflection, 2 for y
+                hit_t, axis = t.copy(), np.zeros(self.n, dtype=np.int8)
+                top = -y / vy
+                bottom = (height - ball_size - y) / vy
+                wall = np.where(vy < 0, top, bottom)
+                hit = (vy != 0) & (wall < hit_t)
+                hit_t[hit], axis[hit] = wall[hit], 2
+                for px, py in ((paddle_a_x, self.paddle_a), (paddle_b_x, self.paddle_b)):
+                    enter, side = self._sweep_box(x, y, vx, vy, px - ball_size, py - ball_size,
+                                                  px + paddle_w, py + paddle_h)
+                    hit = enter < hit_t
+                    hit_t[hit], axis[hit] = enter[hit], side[hit]
+                # Games that already finished their step stay frozen
+                hit_t[~active] = 0
+                x = x + vx * hit_t
+                y = y + vy * hit_t
+                t = t - hit_t
+                vx = np.where(active & (axis == 1), -vx, vx)
+                vy = np.where(active & (axis == 2), -vy, vy)
+                active &= axis != 0
+                if not active.any():
+                    break
+        self.ball_x, self.ball_y, self.ball_vx, self.ball_vy = x, y, vx, vy
+
+    # Vectorised sweep_box: entry time (inf where there is none) and axis (1 = x, 2 = y)
+    @staticmethod
+    def _sweep_box(x, y, vx, vy, x0, y0, x1, y1):
+        tx0 = np.where(vx > 0, (x0 - x) / vx, (x1 - x) / vx)
+        tx1 = np.where(vx > 0, (x1 - x) / vx, (x0 - x) / vx)
+        ty0 = np.where(vy > 0, (y0 - y) / vy, (y1 - y) / vy)
+        ty1 = np.where(vy > 0, (y1 - y) / vy, (y0 - y) / vy)
+        inside_x = (x0 < x) & (x < x1)
+        inside_y = (y0 < y) & (y < y1)
+        tx0 = np.where(vx == 0, -np.inf, tx0)
+        tx1 = np.where(vx == 0, np.inf, tx1)
+        ty0 = np.where(vy == 0, -np.inf, ty0)
+        ty1 = np.where(vy == 0, np.inf, ty1)
+        enter, leave = np.maximum(tx0, ty0), np.minimum(tx1, ty1)
+        miss = ((vx == 0) & ~inside_x) | ((vy == 0) & ~inside_y) | (enter < 0) | (enter >= leave)
+        return np.where(miss, np.inf, enter), np.where(tx0 >= ty0, 1, 2).astype(np.int8)
+
+# Play the same random moves through Pong and PongBatch and compare every state
+def check_batch(n=64, steps=2000, dt=1.0, seed=0):
+    rng = np.random.default_rng(seed)
+    games = [Pong() for _ in range(n)]
+    batch = PongBatch(n, dt)
+    for _ in range(steps):
+        actions = rng.integers(-1, 2, size=(n, 2))
+        obs, rewards, done = batch.step(actions)
+        points = [game.step(int(a), int(b), dt) for game, (a, b) in zip(games, actions)]
+        if not (np.array_equal(obs, [game.state() for game in games]) and
+                np.array_equal(rewards[:, 0], points)):
+            return False
+    return True
+
+def benchmark_batch(sizes=(1, 256, 4096, 65536), steps=200):
+    rng = np.random.default_rng(0)
+    print(f"{'games':>8} {'steps/s':>14}")
+    for n in sizes:
+        batch = PongBatch(n)
+        actions = rng.integers(-1, 2, size=(steps, n, 2))
+        start = time.perf_counter()
+        for i in range(steps):
+            batch.step(actions[i])
+        print(f"{n:>8} {n * steps / (time.perf_counter() - start):>14,.0f}")
+
+# Headless check: fire balls at 10x-50x the normal speed and make sure none of
+# them tunnels through a paddle or leaves through the top and bottom walls
+def selftest():
+    failures = 0
+    for multiple in (10, 20, 30, 40, 50):
+        speed = ball_speed * multiple
+        for start_y in range(0, height - ball_size + 1, 47):
+            for direction in (-1, 1):
+                game = Pong()
+                game.paddle_a = game.paddle_b = min(max(start_y - paddle_h / 2, 0), height - paddle_h)
+                game.ball_x = width / 2 - ball_size / 2
+                game.ball_y = start_y
+                game.ball_vx, game.ball_vy = direction * speed, 0
+                for _ in range(20):
+                    if game.step():
+                        failures += 1
+                        print(f"{multiple}x: ball from y={start_y} got past a paddle")
+                        break
+        # Steep shots bounce off the walls many times per frame
+        game = Pong()
+        game.paddle_a = game.paddle_b = -paddle_h
+        game.ball_vx, game.ball_vy = 0.5, speed
+        for _ in range(100):
+            game.step()
+            if not 0 <= game.ball_y <= height - ball_size:
+                failures += 1
+                print(f"{multiple}x: ball left the field at y={game.ball_y:.1f}")
+                break
+    for dt in (1.0, 0.5, 0.25):
+        if not check_batch(dt=dt):
+            failures += 1
+            print(f"PongBatch diverged from Pong at dt={dt}")
+    print("selftest", "failed" if failures else "passed")
+    return failures == 0
+
+# ====================== NETPLAY ======================
+# Two machines each run the full simulation one 60 Hz frame at a time.
+# Local input is scheduled input_delay frames ahead and sent over UDP along
+# with every input the peer has not acknowledged yet, so lost packets are
+# covered by the next one. Missing remote input is predicted (the last
+# confirmed move repeated); when the real input turns out different, the
+# session restores the snapshot taken before that frame and resimulates.
+
+# Packet: magic, ack (last remote frame we hold contiguously), first frame, count, moves
+packet_header = struct.Struct("!2siIB")
+packet_magic = b"PN"
+max_resend = 64
+
+class UdpTransport:
+    def __init__(self, local_port=0, remote=None, host="0.0.0.0"):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, local_port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+        self.remote = remote
+
+    def send(self, data):
+        self.sock.sendto(data, self.remote)
+
+    def receive(self):
+        packets = []
+        while True:
+            try:
+                data, sender = self.sock.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                return packets
+            if sender == self.remote or self.remote is None:
+                packets.append(data)
+
+# Wraps a transport to drop a fraction of outgoing packets and hold the rest
+# back by latency plus random jitter (which also reorders them)
+class LossyTransport:
+    def __init__(self, inner, loss=0.0, latency=0.0, jitter=0.0, seed=None, clock=time.perf_counter):
+        self.inner = inner
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self.queue = []
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, data):
+        self.sent += 1
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        due = self.clock() + self.latency + self.rng.uniform(0, self.jitter)
+        heapq.heappush(self.queue, (due, self.sent, data))
+
+    def receive(self):
+        now = self.clock()
+        while self.queue and self.queue[0][0] <= now:
+            self.inner.send(heapq.heappop(self.queue)[2])
+        return self.inner.receive()
+
+def state_checksum(state):
+    return zlib.crc32(struct.pack("6d", *state))
+
+class RollbackSession:
+    # side 0 controls paddle A, side 1 paddle B
+    def __init__(self, side, transport, input_delay=2, max_rollback=10):
+        self.side = side
+        self.transport = transport
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+        self.game = Pong()
+        self.frame = 0
+        self.connected = False
+        # Nobody presses anything during the first input_delay frames. Frame
+        # -1 is never simulated; it is a neutral confirmed input so that with
+        # no delay the remote side still has a last known move to predict from.
+        self.local = {f: 0 for f in range(-1, input_delay)}
+        self.remote = {f: 0 for f in range(-1, input_delay)}
+        self.remote_confirmed = input_delay - 1
+        self.peer_ack = -1
+        self.used_remote = {}
+        self.snapshots = {}
+        # crc32 of the state at the start of every frame whose inputs are all confirmed
+        self.checksums = {}
+        self.stalls = 0
+        self.rollbacks = 0
+        self.max_depth = 0
+        self.resim_time = 0.0
+
+    # Advance one frame with the local move, unless waiting on the peer.
+    # Returns whether the simulation moved forward.
+    def tick(self, move):
+        self.receive()
+        if not self.connected or self.frame - self.remote_confirmed > self.max_rollback:
+            self.send()
+            self.stalls += 1
+            return False
+        self.local[self.frame + self.input_delay] = move
+        self.send()
+        self.simulate(self.frame)
+        self.frame += 1
+        self.record_checksums()
+        return True
+
+    def send(self):
+        # With no input delay, everything may have been acknowledged and
+        # trimmed; the packet then just carries our ack
+        first = max(self.peer_ack + 1, min(self.local, default=0))
+        last = min(max(self.local, default=first - 1), first + max_resend - 1)
+        moves = [self.local[f] for f in range(first, last + 1)]
+        data = packet_header.pack(packet_magic, self.remote_confirmed, first, len(moves))
+        self.transport.send(data + struct.pack(f"{len(moves)}b", *moves))
+
+    def receive(self):
+        rollback_from = None
+        for data in self.transport.receive():
+            if len(data) < packet_header.size or data[:2] != packet_magic:
+                continue
+            _, ack, first, count = packet_header.unpack_from(data)
+            moves = struct.unpack_from(f"{count}b", data, packet_header.size)
+            self.connected = True
+            self.peer_ack = max(self.peer_ack, ack)
+            for f, move in enumerate(moves, first):
+                if f <= self.remote_confirmed or f in self.remote:
+                    continue
+                self.remote[f] = move
+                if f < self.frame and self.used_remote[f] != move:
+                    rollback_from = f if rollback_from is None else min(rollback_from, f)
+            while self.remote_confirmed + 1 in self.remote:
+                self.remote_confirmed += 1
+        if rollback_from is not None:
+            self.rollback(rollback_from)
+        self.trim()
+
+    def simulate(self, f):
+        self.snapshots[f] = self.game.state()
+        remote = self.remote.get(f)
+        if remote is None:
+            remote = self.remote[self.remote_confirmed]
+        self.used_remote[f] = remote
+        if self.side == 0:
+            self.game.step(self.local[f], remote)
+        else:
+            self.game.step(remote, self.local[f])
+
+    def rollback(self, f):
+        start = time.perf_counter()
+        self.game.restore(self.snapshots[f])
+        for g in range(f, self.frame):
+            self.simulate(g)
+        self.resim_time += time.perf_counter() - start
+        self.rollbacks += 1
+        self.max_depth = max(self.max_depth, self.frame - f)
+
+    def record_checksums(self):
+        final = min(self.remote_confirmed + 1, self.frame)
+        for f in range(max(self.checksums, default=-1) + 1, final + 1):
+            state = self.snapshots[f] if f < self.frame else self.game.state()
+            self.checksums[f] = state_checksum(state)
+
+    # Frames up to remote_confirmed can never be rolled back to, and inputs
+    # the peer has acknowledged never need resending
+    def trim(self):
+        self.record_checksums()
+        for f in [f for f in self.snapshots if f < self.remote_confirmed]:
+            del self.snapshots[f]
+            del self.used_remote[f]
+        for f in [f for f in self.remote if f < self.remote_confirmed]:
+            del self.remote[f]
+        keep = min(self.peer_ack + 1, self.remote_confirmed + 1, self.frame)
+        for f in [f for f in self.local if f < keep]:
+            del self.local[f]
+
+# Two sessions in one process over localhost UDP, with injected loss and
+# latency. Both must agree on the state of every frame they have confirmed.
+def net_selftest(frames=1200, loss=0.15, latency=0.05, jitter=0.03, seed=0, input_delay=2):
+    now = [0.0]
+    clock = lambda: now[0]
+    udp = [UdpTransport(0, host="127.0.0.1"), UdpTransport(0, host="127.0.0.1")]
+    udp[0].remote, udp[1].remote = udp[1].address, udp[0].address
+    sessions = [RollbackSession(side, LossyTransport(udp[side], loss, latency, jitter, seed + side, clock),
+                                input_delay) for side in (0, 1)]
+    rng = random.Random(seed)
+    moves = [0, 0]
+    while min(session.frame for session in sessions) < frames:
+        for side, session in enumerate(sessions):
+            if rng.random() < 0.1:
+                moves[side] = rng.choice((-1, 0, 1))
+            session.tick(moves[side])
+        now[0] += 1 / 60
+    for session in sessions:
+        session.receive()
+    common = sessions[0].checksums.keys() & sessions[1].checksums.keys()
+    mismatched = [f for f in common if sessions[0].checksums[f] != sessions[1].checksums[f]]
+
+    # Worst case cost: restore a snapshot and resimulate 8 frames
+    game = Pong()
+    snapshot = game.state()
+    runs = 1000
+    start = time.perf_counter()
+    for _ in range(runs):
+        game.restore(snapshot)
+        for _ in range(8):
+            game.step(1, -1)
+    resim_ms = (time.perf_counter() - start) * 1000 / runs
+
+    for side, session in enumerate(sessions):
+        lossy = session.transport
+        print(f"side {side}: frame {session.frame}, {session.rollbacks} rollbacks "
+              f"(deepest {session.max_depth}), {session.stalls} stalls, "
+              f"{lossy.dropped}/{lossy.sent} packets dropped")
+    print(f"{len(common)} confirmed frames compared, {len(mismatched)} mismatched")
+    print(f"restore + 8-frame resimulation: {resim_ms:.3f} ms")
+    return not mismatched and len(common) > frames // 2
+
+def main_netplay(side, local_port, remote, input_delay=2, loss=0.0, latency=0.0, jitter=0.0):
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption("Pong - waiting for peer")
+    host, port = remote.rsplit(":", 1)
+    transport = UdpTransport(local_port, (socket.gethostbyname(host), int(port)))
+    if loss or latency or jitter:
+        transport = LossyTransport(transport, loss, latency, jitter)
+    session = RollbackSession(side, transport, input_delay)
+
+    clock = pygame.time.Clock()
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+        # Either key pair moves this machine's paddle
+        keys = pygame.key.get_pressed()
+        session.tick((keys[pygame.K_s] or keys[pygame.K_DOWN]) - (keys[pygame.K_w] or keys[pygame.K_UP]))
+
+        state = session.game.state()
+        paddle_a, paddle_b, ball = interpolated_rects(state, state, 0)
+        screen.fill((0, 0, 0))
+        pygame.draw.rect(screen, (255, 255, 255), paddle_a)
+        pygame.draw.rect(screen, (255, 255, 255), paddle_b)
+        pygame.draw.ellipse(screen, (255, 255, 255), ball)
+        pygame.draw.aaline(screen, (255, 255, 255), (width//2, 0), (width//2, height))
+        pygame.display.flip()
+        clock.tick(60)
+        if session.frame % 60 == 0 and session.connected:
+            pygame.display.set_caption(f"Pong - side {'AB'[side]} - frame {session.frame} - "
+                                       f"{session.rollbacks} rollbacks, {session.stalls} stalls")
+
+    pygame.quit()
+
+# Physics runs at a fixed physics_hz from a time accumulator, independent of
+# the render rate (fps, 0 for uncapped). Frames draw the last two physics
+# states blended by how far the accumulator is into the next step.
+def main(physics_hz=120, fps=60, input_latency=False):
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption("Pong")
+    game = Pong()
+    step_time = 1 / physics_hz
+    dt = 60 / physics_hz
+    prev = cur = game.state()
+
+    # Game loop
+    clock = pygame.time.Clock()
+    accumulator = 0.0
+    last = time.perf_counter()
+    counter_start, steps, frames = last, 0, 0
+    probe = LatencyProbe({pygame.K_w, pygame.K_s, pygame.K_UP, pygame.K_DOWN}) if input_latency else None
+    total_steps = 0
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if probe:
+                probe.on_event(event)
+
+        now = time.perf_counter()
+        # Clamp long stalls so physics never spirals trying to catch up
+        accumulator += min(now - last, 0.25)
+        last = now
+
+        # Move paddles
+        keys = pygame.key.get_pressed()
+        move_a = keys[pygame.K_s] - keys[pygame.K_w]
+        move_b = keys[pygame.K_DOWN] - keys[pygame.K_UP]
+        while accumulator >= step_time:
+            prev = cur
+            if game.step(move_a, move_b, dt):
+                prev = None
+            cur = game.state()
+            accumulator -= step_time
+            steps += 1
+            total_steps += 1
+            if probe:
+                probe.consume(total_steps)
+
+        # Draw (no blending across a reset, the ball jumps to the centre)
+        paddle_a, paddle_b, ball = interpolated_rects(prev or cur, cur, accumulator / step_time)
+        screen.fill((0, 0, 0))
+        pygame.draw.rect(screen, (255, 255, 255), paddle_a)
+        pygame.draw.rect(screen, (255, 255, 255), paddle_b)
+        pygame.draw.ellipse(screen, (255, 255, 255), ball)
+        pygame.draw.aaline(screen, (255, 255, 255), (width//2, 0), (width//2, height))
+        pygame.display.flip()
+        if probe:
+            probe.presented()
+        clock.tick(fps)
+        frames += 1
+
+        if now - counter_start >= 1:
+            pygame.display.set_caption(f"Pong - {steps / (now - counter_start):.0f} physics steps/s, "
+                                       f"{frames / (now - counter_start):.0f} frames/s")
+            counter_start, steps, frames = now, 0, 0
+
+    pygame.quit()
+    if probe:
+        print(probe.report())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pong")
+    parser.add_argument("--physics-hz", type=int, default=120, help="fixed physics rate")
+    parser.add_argument("--fps", type=int, default=60, help="render rate cap, 0 for uncapped")
+    parser.add_argument("--input-latency", action="store_true", help="print input-to-photon latency on exit")
+    parser.add_argument("--selftest", action="store_true", help="run the headless physics tests")
+    parser.add_argument("--bench-batch", action="store_true", help="time the vectorised simulator")
+    parser.add_argument("--net", nargs=2, metavar=("LOCAL_PORT", "REMOTE_HOST:PORT"),
+                        help="play one paddle against another machine over UDP")
+    parser.add_argument("--side", choices=["a", "b"], default="a", help="paddle controlled in --net mode")
+    parser.add_argument("--input-delay", type=int, default=2, help="netplay input delay in frames")
+    parser.add_argument("--loss", type=float, default=0.0, help="fraction of netplay packets to drop")
+    parser.add_argument("--latency", type=float, default=0.0, help="added netplay latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra netplay latency in seconds")
+    parser.add_argument("--net-selftest", action="store_true", help="run two rollback sessions over localhost")
+    args = parser.parse_args()
+    if args.input_delay < 0:
+        parser.error("--input-delay can't be negative")
+    if args.selftest:
+        sys.exit(0 if selftest() else 1)
+    if args.net_selftest:
+        passed = net_selftest(input_delay=args.input_delay)
+        print("net selftest", "passed" if passed else "failed")
+        sys.exit(0 if passed else 1)
+    if args.net:
+        main_netplay("ab".index(args.side), int(args.net[0]), args.net[1], args.input_delay,
+                     args.loss, args.latency, args.jitter)
+        sys.exit()
+    if args.bench_batch:
+        benchmark_batch()
+        sys.exit()
+    main(args.physics_hz, args.fps, args.input_latency)
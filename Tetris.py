@@ -1,28 +1,179 @@
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # keep --bench stdout pure JSON
 import pygame
 import random
+import argparse
+import time
+import sys
+import json
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 
-pygame.init()
 width, height = 300, 600
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption("Tetris")
-
-# Grid
-grid = [[0] * 10 for _ in range(20)]
+cols, rows = 10, 20
 block_size = 30
 
-# Tetromino shapes
+# Bitboard: one int per row, bit (wall + j) set when column j is filled.
+# Guard bits on both sides act as walls, hidden rows above the screen give
+# pieces room to rotate, and solid rows below the screen act as the floor.
+wall = 4
+hidden = 4
+floor = 4
+full_row = ((1 << cols) - 1) << wall
+empty_row = ((1 << (cols + 2 * wall)) - 1) ^ full_row
+solid_row = full_row | empty_row
+
+# Tetromino shapes, in their SRS spawn orientation inside their rotation box
 shapes = [
-    [[1, 1, 1, 1]], # I
+    [[0, 0, 0, 0], [1, 1, 1, 1], [0, 0, 0, 0], [0, 0, 0, 0]], # I
+    [[1, 0, 0], [1, 1, 1], [0, 0, 0]], # J
+    [[0, 0, 1], [1, 1, 1], [0, 0, 0]], # L
     [[1, 1], [1, 1]], # O
-    [[1, 1, 1], [0, 1, 0]] # T
+    [[0, 1, 1], [1, 1, 0], [0, 0, 0]], # S
+    [[0, 1, 0], [1, 1, 1], [0, 0, 0]], # T
+    [[1, 1, 0], [0, 1, 1], [0, 0, 0]] # Z
 ]
+shape_i, shape_o = 0, 3
 
-class Tetromino:
+def rotate_cw(shape):
+    return [list(row) for row in zip(*shape[::-1])]
+
+# Per shape and rotation: (row offset, row mask) for every non-empty row
+def row_masks(shape):
+    return tuple((i, sum(1 << j for j, cell in enumerate(row) if cell))
+                 for i, row in enumerate(shape) if any(row))
+
+piece_masks = []
+for shape in shapes:
+    rotations = [shape]
+    for _ in range(3):
+        rotations.append(rotate_cw(rotations[-1]))
+    piece_masks.append(tuple(row_masks(r) for r in rotations))
+
+# SRS wall kicks, (dx, dy) with y pointing up as in the guideline, for each
+# (from, to) rotation state: 0 = spawn, 1 = R, 2 = 180, 3 = L
+jlstz_kicks = {
+    (0, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (1, 0): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (1, 2): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (2, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (2, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+    (3, 2): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (3, 0): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (0, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+}
+i_kicks = {
+    (0, 1): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (1, 0): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (1, 2): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+    (2, 1): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (2, 3): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (3, 2): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (3, 0): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (0, 3): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+}
+
+# rotation_table[shape][state][direction] = (new state, masks, kicks in board
+# coordinates), direction 1 for clockwise and -1 for counter-clockwise.
+# Built once here so rotating in game is a lookup plus up to five probes.
+rotation_table = []
+for shape in range(len(shapes)):
+    kicks = i_kicks if shape == shape_i else jlstz_kicks
+    states = []
+    for state in range(4):
+        turns = {}
+        for direction in (1, -1):
+            to = (state + direction) % 4
+            offsets = ((0, 0),) if shape == shape_o else tuple((dx, -dy) for dx, dy in kicks[state, to])
+            turns[direction] = (to, piece_masks[shape][to], offsets)
+        states.append(turns)
+    rotation_table.append(states)
+
+class Board:
+    def __init__(self, board_rows=None):
+        self.rows = list(board_rows) if board_rows else [empty_row] * (hidden + rows) + [solid_row] * floor
+
+    def copy(self):
+        return Board(self.rows)
+
+    def collides(self, masks, x, y):
+        board = self.rows
+        shift = x + wall
+        base = y + hidden
+        for i, mask in masks:
+            if board[base + i] & (mask << shift):
+                return True
+        return False
+
+    # Returns the board rows the piece landed in
+    def lock(self, masks, x, y):
+        shift = x + wall
+        base = y + hidden
+        for i, mask in masks:
+            self.rows[base + i] |= mask << shift
+        return range(base + masks[0][0], base + masks[-1][0] + 1)
+
+    # Only the rows the last piece touched can have become full, so only those
+    # are checked. Full rows are cut out of that span and the same number of
+    # empty rows go in at the top: two list splices, whatever the stack height.
+    def clear_lines(self, touched):
+        board = self.rows
+        full = [i for i in touched if board[i] == solid_row]
+        if full:
+            lo, hi = full[0], full[-1] + 1
+            board[lo:hi] = [row for row in board[lo:hi] if row != solid_row]
+            board[0:0] = [empty_row] * len(full)
+        return len(full)
+
+# Scoring: points per clear scale with level, and consecutive clears add a combo bonus
+line_points = {1: 100, 2: 300, 3: 500, 4: 800}
+combo_points = 50
+lines_per_level = 10
+
+class Score:
     def __init__(self):
-        self.shape = random.choice(shapes)
-        self.x = 3
+        self.points = 0
+        self.lines = 0
+        self.level = 1
+        self.combo = -1
+
+    def add(self, cleared):
+        if not cleared:
+            self.combo = -1
+            return
+        self.combo += 1
+        self.points += (line_points[cleared] + combo_points * self.combo) * self.level
+        self.lines += cleared
+        self.level = self.lines // lines_per_level + 1
+
+    # Soft drop scores 1 per row, hard drop 2
+    def drop(self, distance, hard=False):
+        self.points += distance * (2 if hard else 1)
+
+def spawn_x(shape):
+    return 4 if shape == shape_o else 3
+
+# First SRS kick that fits: (x, y, state) after the turn, or None
+def kick(board, shape, x, y, state, direction):
+    to, masks, kicks = rotation_table[shape][state][direction]
+    for dx, dy in kicks:
+        if not board.collides(masks, x + dx, y + dy):
+            return x + dx, y + dy, to
+    return None
+
+class Tetromino:
+    def __init__(self, board, shape=None):
+        self.board = board
+        self.shape = random.randrange(len(shapes)) if shape is None else shape
+        self.rotation = 0
+        self.x = spawn_x(self.shape)
         self.y = 0
 
+    @property
+    def masks(self):
+        return piece_masks[self.shape][self.rotation]
+
     def move_down(self):
         self.y += 1
         if self.check_collision():
@@ -40,57 +191,628 @@ class Tetromino:
         if self.check_collision():
             self.x -= 1
 
+    def rotate(self, direction=1):
+        turned = kick(self.board, self.shape, self.x, self.y, self.rotation, direction)
+        if turned:
+            self.x, self.y, self.rotation = turned
+        return turned is not None
+
     def check_collision(self):
-        for i in range(len(self.shape)):
-            for j in range(len(self.shape[0])):
-                if self.shape[i][j]:
-                    if (self.y + i >= 20 or
-                        self.x + j < 0 or
-                        self.x + j >= 10 or
-                        grid[self.y + i][self.x + j]):
-                        return True
-        return False
+        return self.board.collides(self.masks, self.x, self.y)
 
-    def draw(self):
-        for i in range(len(self.shape)):
-            for j in range(len(self.shape[0])):
-                if self.shape[i][j]:
+    def lock(self):
+        return self.board.lock(self.masks, self.x, self.y)
+
+    def draw(self, screen):
+        for i, mask in self.masks:
+            for j in range(mask.bit_length()):
+                if mask >> j & 1:
                     pygame.draw.rect(screen, (255, 255, 255),
                                     (self.x * block_size + j * block_size,
                                      self.y * block_size + i * block_size,
                                      block_size, block_size))
 
-# Game loop
-current_piece = Tetromino()
-clock = pygame.time.Clock()
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_LEFT:
-                current_piece.move_left()
-            if event.key == pygame.K_RIGHT:
-                current_piece.move_right()
-
-    # Move piece down
-    if not current_piece.move_down():
-        for i in range(len(current_piece.shape)):
-            for j in range(len(current_piece.shape[0])):
-                if current_piece.shape[i][j]:
-                    grid[current_piece.y + i][current_piece.x + j] = 1
-        current_piece = Tetromino()
-
-    # Draw
-    screen.fill((0, 0, 0))
-    for i in range(20):
-        for j in range(10):
-            if grid[i][j]:
-                pygame.draw.rect(screen, (255, 255, 255),
-                                (j * block_size, i * block_size, block_size, block_size))
-    current_piece.draw()
-    pygame.display.flip()
-    clock.tick(5)
-
-pygame.quit()
+# 7-bag randomiser: each run of seven pieces is one of every shape in a
+# shuffled order, drawn from a seeded generator so a game can be replayed
+class SevenBag:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.bag = []
+
+    def next(self):
+        if not self.bag:
+            self.bag = list(range(len(shapes)))
+            self.rng.shuffle(self.bag)
+        return self.bag.pop()
+
+# ====================== ENGINE ======================
+seed_mask = (1 << 64) - 1
+# The game advances in whole frames, so timings are frame counts and a run
+# depends only on the seed and which inputs arrived before which frame.
+fps = 60
+das_frames = 10         # delayed auto shift: hold this long before repeating
+arr_frames = 2          # auto repeat rate: then one shift every this many frames
+lock_delay_frames = 30  # frames a resting piece waits before it locks
+max_lock_resets = 15    # moves that may restart the lock delay before it stops resetting
+soft_drop_factor = 20
+
+# Guideline gravity curve (seconds per row), as rows per frame. The curve is
+# already past `rows` per frame by level 20, and far beyond that the base
+# goes negative, so the level is clamped there.
+max_gravity_level = 20
+
+def gravity(level):
+    level = min(level, max_gravity_level)
+    return min(rows, 1 / ((0.8 - (level - 1) * 0.007) ** (level - 1) * fps))
+
+class Game:
+    board_type = Board
+
+    def __init__(self, seed=None, replay=None):
+        # Any int is accepted, folded into the 64 bits a replay stores
+        self.seed = random.getrandbits(32) if seed is None else seed & seed_mask
+        self.bag = SevenBag(self.seed)
+        self.replay = replay  # Replay that press/release get logged to
+        self.pieces = 0
+        self.board = self.board_type()
+        self.score = Score()
+        self.shift_keys = []  # held "left"/"right", most recent last
+        self.soft = False
+        self.frame = 0
+        self.next_shape = self.bag.next()
+        self.spawn()
+
+    def spawn(self):
+        self.piece = Tetromino(self.board, self.next_shape)
+        self.next_shape = self.bag.next()
+        self.fall = 0.0
+        self.das = 0
+        self.lock_timer = 0
+        self.lock_resets = 0
+        self.lowest = self.piece.y
+        self.hard_drop = False
+        self.game_over = self.piece.check_collision()
+
+    def resting(self):
+        return self.board.collides(self.piece.masks, self.piece.x, self.piece.y + 1)
+
+    # A successful shift or turn on the ground restarts the lock delay, a
+    # limited number of times per piece so it can't be stalled forever
+    def moved(self):
+        if self.lock_timer and self.lock_resets < max_lock_resets:
+            self.lock_timer = 0
+            self.lock_resets += 1
+
+    def shift(self, dx):
+        x = self.piece.x
+        if dx < 0:
+            self.piece.move_left()
+        else:
+            self.piece.move_right()
+        if self.piece.x != x:
+            self.moved()
+
+    # Actions: "left", "right", "soft", "hard", "cw", "ccw"
+    def press(self, action):
+        if self.replay:
+            self.replay.log(self.frame, action, True)
+        if self.game_over:
+            return
+        if action in ("left", "right"):
+            if action in self.shift_keys:
+                self.shift_keys.remove(action)
+            self.shift_keys.append(action)
+            self.das = 0
+            self.shift(-1 if action == "left" else 1)
+        elif action == "soft":
+            self.soft = True
+        elif action == "hard":
+            distance = 0
+            while self.piece.move_down():
+                distance += 1
+            self.score.drop(distance, hard=True)
+            self.hard_drop = True
+        elif self.piece.rotate(1 if action == "cw" else -1):
+            self.moved()
+
+    def release(self, action):
+        if self.replay:
+            self.replay.log(self.frame, action, False)
+        if action in self.shift_keys:
+            self.shift_keys.remove(action)
+            self.das = 0
+        elif action == "soft":
+            self.soft = False
+
+    # Advance one frame. Returns (touched rows, lines cleared) when a piece
+    # locked this frame, else None.
+    def step(self):
+        if self.game_over:
+            return None
+        self.frame += 1
+        if not self.hard_drop:
+            if self.shift_keys:
+                self.das += 1
+                if self.das >= das_frames and (self.das - das_frames) % arr_frames == 0:
+                    self.shift(-1 if self.shift_keys[-1] == "left" else 1)
+            rate = gravity(self.score.level)
+            if self.soft:
+                rate = min(rows, rate * soft_drop_factor)
+            self.fall += rate
+            while self.fall >= 1:
+                self.fall -= 1
+                if not self.piece.move_down():
+                    self.fall = 0.0
+                    break
+                if self.soft:
+                    self.score.drop(1)
+            # Reaching a new lowest row gives a fresh lock delay
+            if self.piece.y > self.lowest:
+                self.lowest = self.piece.y
+                self.lock_timer = 0
+                self.lock_resets = 0
+            if not self.resting():
+                return None
+            self.lock_timer += 1
+            if self.lock_timer < lock_delay_frames:
+                return None
+        touched = self.piece.lock()
+        cleared = self.board.clear_lines(touched)
+        self.score.add(cleared)
+        self.pieces += 1
+        self.spawn()
+        return touched, cleared
+
+    # Board rows plus score, for checking that a replay ended where it should
+    def checksum(self):
+        rows = struct.pack(f"<{len(self.board.rows)}I", *self.board.rows)
+        return zlib.crc32(struct.pack("<QI", self.score.points, self.score.lines), zlib.crc32(rows))
+
+# Replay file: a header with the seed, the frame count and the final
+# checksum, then one event per press/release: the frames since the previous
+# event as a varint and one byte for the action (high bit set on release).
+# Events stamped with frame f are applied before the game's (f + 1)th step.
+replay_magic = b"TRPL"
+replay_version = 1
+replay_header = struct.Struct("<4sBQII")
+actions = ("left", "right", "soft", "hard", "cw", "ccw")
+
+class Replay:
+    def __init__(self, seed, events=None, frames=0, checksum=0):
+        self.seed = seed & seed_mask
+        self.events = events or []  # (frame, action, pressed)
+        self.frames = frames
+        self.checksum = checksum
+
+    def log(self, frame, action, pressed):
+        self.events.append((frame, action, pressed))
+
+    def save(self, path, game):
+        self.frames = game.frame
+        self.checksum = game.checksum()
+        data = bytearray(replay_header.pack(replay_magic, replay_version, self.seed, self.frames, self.checksum))
+        last = 0
+        for frame, action, pressed in self.events:
+            delta = frame - last
+            last = frame
+            while delta >= 0x80:
+                data.append(delta & 0x7f | 0x80)
+                delta >>= 7
+            data.append(delta)
+            data.append(actions.index(action) | (0 if pressed else 0x80))
+        with open(path, "wb") as f:
+            f.write(data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, seed, frames, checksum = replay_header.unpack_from(data)
+        if magic != replay_magic or version != replay_version:
+            raise ValueError(f"{path} is not a version {replay_version} Tetris replay")
+        events = []
+        frame = 0
+        pos = replay_header.size
+        while pos < len(data):
+            delta = shift = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                delta |= (byte & 0x7f) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            frame += delta
+            code = data[pos]
+            pos += 1
+            events.append((frame, actions[code & 0x7f], not code & 0x80))
+        return cls(seed, events, frames, checksum)
+
+# Play a replay back without a window, as fast as the engine runs
+def play_replay(replay):
+    return drive(replay)[0]
+
+def run_replay(path):
+    replay = Replay.load(path)
+    start = time.perf_counter()
+    game = play_replay(replay)
+    elapsed = time.perf_counter() - start
+    ok = game.checksum() == replay.checksum
+    print(f"seed {replay.seed}: {replay.frames} frames, {len(replay.events)} inputs, {game.pieces} pieces, "
+          f"score {game.score.points}, lines {game.score.lines}")
+    print(f"{elapsed:.3f} s ({replay.frames / max(elapsed, 1e-9):,.0f} frames/s), "
+          f"checksum {'matches' if ok else 'MISMATCH'}")
+    return ok
+
+# Locked stack, pre-rendered. Cells only change when a piece locks, so the
+# view repaints just the rows a lock touched; a line clear shifts everything
+# above it, so that repaints from the top down to the lowest touched row.
+class BoardView:
+    def __init__(self, board, color=(255, 255, 255), background=(0, 0, 0)):
+        self.board = board
+        self.color = color
+        self.background = background
+        self.surface = pygame.Surface((width, height))
+        if pygame.display.get_surface():
+            self.surface = self.surface.convert()
+        self.repaint(range(hidden, hidden + rows))
+
+    # Repaint board rows (bitboard indices); hidden rows are skipped
+    def repaint(self, board_rows):
+        fill = self.surface.fill
+        for r in board_rows:
+            i = r - hidden
+            if i < 0 or i >= rows:
+                continue
+            y = i * block_size
+            fill(self.background, (0, y, width, block_size))
+            row = self.board.rows[r] & full_row
+            while row:
+                low = row & -row
+                fill(self.color, ((low.bit_length() - 1 - wall) * block_size, y, block_size, block_size))
+                row ^= low
+
+    # Call after lock + clear_lines with the rows the piece landed in
+    def update(self, touched, cleared):
+        self.repaint(range(0, touched[-1] + 1) if cleared else touched)
+
+    def draw(self, screen):
+        screen.blit(self.surface, (0, 0))
+
+# ====================== AUTOPLAYER ======================
+# Every final placement the current piece can reach from its spawn with
+# shifts, SRS rotations and soft drops (so tucks and spins are included),
+# keyed by the cells it would fill so equivalent rotations count once.
+def placements(board, shape):
+    start = (spawn_x(shape), 0, 0)
+    if board.collides(piece_masks[shape][0], start[0], start[1]):
+        return {}
+    collides = board.collides
+    seen = {start}
+    stack = [start]
+    finals = {}
+    while stack:
+        x, y, state = stack.pop()
+        masks = piece_masks[shape][state]
+        moves = []
+        if collides(masks, x, y + 1):
+            finals.setdefault(tuple((y + i, mask << (x + wall)) for i, mask in masks), (x, y, state))
+        else:
+            moves.append((x, y + 1, state))
+        if not collides(masks, x - 1, y):
+            moves.append((x - 1, y, state))
+        if not collides(masks, x + 1, y):
+            moves.append((x + 1, y, state))
+        for direction in (1, -1):
+            turned = kick(board, shape, x, y, state, direction)
+            if turned:
+                moves.append(turned)
+        for move in moves:
+            if move not in seen:
+                seen.add(move)
+                stack.append(move)
+    return finals
+
+# Heuristic weights (positive is good); features are measured after clearing
+default_weights = {"height": -0.510066, "lines": 0.760666, "holes": -0.35663, "bumpiness": -0.184483}
+
+def board_features(board):
+    heights = [0] * cols
+    seen = holes = 0
+    for r in range(hidden + rows):
+        cells = board.rows[r] & full_row
+        new = cells & ~seen
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1 - wall] = hidden + rows - r
+            new ^= low
+        holes += (seen & ~cells).bit_count()
+        seen |= cells
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return sum(heights), holes, bumpiness
+
+def evaluate(board, lines, weights):
+    height, holes, bumpiness = board_features(board)
+    return (weights["height"] * height + weights["lines"] * lines +
+            weights["holes"] * holes + weights["bumpiness"] * bumpiness)
+
+# Place `shape` every possible way on a board given as a row tuple and score
+# the results. Returns (board rows, lines so far, placement, score) per
+# outcome. Module level so a process pool can run it.
+def expand(board_rows, shape, lines, weights):
+    board = Board(board_rows)
+    outcomes = []
+    for x, y, state in placements(board, shape).values():
+        after = board.copy()
+        total = lines + after.clear_lines(after.lock(piece_masks[shape][state], x, y))
+        outcomes.append((tuple(after.rows), total, (x, y, state), evaluate(after, total, weights)))
+    return outcomes
+
+class Autoplayer:
+    # depth: how many known pieces (current plus preview) to search through.
+    # beam_width: boards kept between depths. workers > 0 expands and scores
+    # the beam in a process pool.
+    def __init__(self, weights=None, depth=1, beam_width=8, workers=0):
+        self.weights = weights or default_weights
+        self.depth = depth
+        self.beam_width = beam_width
+        self.pool = ProcessPoolExecutor(workers) if workers else None
+        self.evaluated = 0
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown()
+
+    def _expand_all(self, beam, shape):
+        args = ([entry[0] for entry in beam], [shape] * len(beam),
+                [entry[1] for entry in beam], [self.weights] * len(beam))
+        if self.pool and len(beam) > 1:
+            return list(self.pool.map(expand, *args))
+        return list(map(expand, *args))
+
+    # Best (x, y, rotation) for `shape`, looking ahead through `preview`,
+    # or None if the piece has nowhere to go
+    def choose(self, board, shape, preview=()):
+        pieces = [shape] + list(preview[:self.depth - 1])
+        # Beam entries: (board rows, lines so far, first placement, score)
+        beam = [(tuple(board.rows), 0, None, 0.0)]
+        for piece in pieces:
+            scored = []
+            for (_, _, first, _), outcomes in zip(beam, self._expand_all(beam, piece)):
+                scored.extend((rows_after, lines, first or placement, score)
+                              for rows_after, lines, placement, score in outcomes)
+            self.evaluated += len(scored)
+            if not scored:
+                break
+            scored.sort(key=lambda entry: entry[3], reverse=True)
+            beam = scored[:self.beam_width]
+        return beam[0][2]
+
+def random_board(rng, filled_rows=8, density=0.7):
+    board = Board()
+    for r in range(hidden + rows - filled_rows, hidden + rows):
+        cells = sum(1 << c for c in range(cols) if rng.random() < density)
+        # Leave a gap in every row so none of them starts out full
+        cells &= ~(1 << rng.randrange(cols))
+        board.rows[r] = empty_row | cells << wall
+    return board
+
+def benchmark_ai(boards=20, depths=(1, 2), workers=(0, 2, 4)):
+    rng = random.Random(0)
+    tests = [(random_board(rng), rng.randrange(len(shapes)), rng.randrange(len(shapes))) for _ in range(boards)]
+    print(f"{'depth':>5} {'workers':>7} {'placements/s':>13} {'ms/move':>8}")
+    for depth in depths:
+        for count in workers:
+            player = Autoplayer(depth=depth, workers=count)
+            start = time.perf_counter()
+            for board, shape, preview in tests:
+                player.choose(board, shape, (preview,))
+            elapsed = time.perf_counter() - start
+            player.close()
+            print(f"{depth:>5} {count:>7} {player.evaluated / elapsed:>13,.0f} {elapsed * 1000 / boards:>8.1f}")
+
+# ====================== BENCHMARK ======================
+# Board that counts collision checks and times each lock + line clear
+class ProfiledBoard(Board):
+    def __init__(self, board_rows=None):
+        super().__init__(board_rows)
+        self.checks = 0
+        self.lock_times = []
+
+    def collides(self, masks, x, y):
+        self.checks += 1
+        return Board.collides(self, masks, x, y)
+
+    def lock(self, masks, x, y):
+        self.lock_start = time.perf_counter()
+        return Board.lock(self, masks, x, y)
+
+    def clear_lines(self, touched):
+        cleared = Board.clear_lines(self, touched)
+        self.lock_times.append(time.perf_counter() - self.lock_start)
+        return cleared
+
+class ProfiledGame(Game):
+    board_type = ProfiledBoard
+
+# Random key presses and releases as a replay, so every benchmark pass
+# replays exactly the same input
+def random_replay(seed, frames):
+    rng = random.Random(seed)
+    replay = Replay(seed)
+    for frame in range(frames):
+        if rng.random() < 0.15:
+            replay.log(frame, rng.choice(actions), True)
+        if rng.random() < 0.15:
+            replay.log(frame, rng.choice(("left", "right", "soft")), False)
+    replay.frames = frames
+    return replay
+
+# Run a replay through `game_type`. With `restart`, a finished game is
+# replaced by a fresh one so every frame does work. `on_frame(game, locked)`
+# runs after each step. Returns every game played.
+def drive(replay, game_type=Game, restart=False, on_frame=None):
+    games = [game_type(replay.seed)]
+    events = iter(replay.events)
+    event = next(events, None)
+    for frame in range(replay.frames):
+        game = games[-1]
+        if game.game_over and restart:
+            game = game_type(replay.seed + len(games))
+            games.append(game)
+        while event and event[0] == frame:
+            (game.press if event[2] else game.release)(event[1])
+            event = next(events, None)
+        locked = game.step()
+        if on_frame:
+            on_frame(game, locked)
+    return games
+
+def percentiles(samples, scale=1e6):
+    ordered = sorted(samples) or [0.0]
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * scale
+    return {"mean": round(sum(ordered) / len(ordered) * scale, 3), "p50": round(pick(50), 3),
+            "p99": round(pick(99), 3), "max": round(ordered[-1] * scale, 3)}
+
+# Three passes over the same input: plain engine speed, then collision and
+# lock counters, then the per-frame draw cost on an off-screen display
+def benchmark_engine(frames=20000, seed=0, replay_path=None):
+    replay = Replay.load(replay_path) if replay_path else random_replay(seed, frames)
+    restart = replay_path is None
+
+    start = time.perf_counter()
+    games = drive(replay, Game, restart)
+    engine_seconds = time.perf_counter() - start
+    pieces = sum(game.pieces for game in games)
+
+    profiled = drive(replay, ProfiledGame, restart)
+    checks = sum(game.board.checks for game in profiled)
+    lock_times = [t for game in profiled for t in game.board.lock_times]
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    draw_times = []
+    views = {}
+    def draw(game, locked):
+        start = time.perf_counter()
+        view = views.get(id(game.board))
+        if view is None:
+            view = views[id(game.board)] = BoardView(game.board)
+        elif locked:
+            view.update(*locked)
+        view.draw(screen)
+        game.piece.draw(screen)
+        draw_times.append(time.perf_counter() - start)
+    drive(replay, Game, restart, draw)
+    pygame.quit()
+
+    return {
+        "source": replay_path or "random",
+        "seed": replay.seed,
+        "frames": replay.frames,
+        "games": len(games),
+        "pieces": pieces,
+        "lines": sum(game.score.lines for game in games),
+        "checksum": games[-1].checksum(),
+        "engine": {"seconds": round(engine_seconds, 6),
+                   "frames_per_s": round(replay.frames / engine_seconds, 1),
+                   "pieces_per_s": round(pieces / engine_seconds, 1)},
+        "collision": {"checks": checks,
+                      "checks_per_piece": round(checks / max(pieces, 1), 3),
+                      "checks_per_s": round(checks / engine_seconds, 1)},
+        "lock_clear_us": percentiles(lock_times),
+        "draw_us_per_frame": percentiles(draw_times),
+        "env": {"python": sys.version.split()[0], "pygame": pygame.version.ver},
+    }
+
+# Move a freshly spawned piece straight to the autoplayer's chosen placement
+def place(autoplayer, piece, next_shape):
+    target = autoplayer.choose(piece.board, piece.shape, (next_shape,))
+    if target:
+        piece.x, piece.y, piece.rotation = target
+
+key_actions = {pygame.K_LEFT: "left", pygame.K_RIGHT: "right", pygame.K_DOWN: "soft",
+               pygame.K_SPACE: "hard", pygame.K_UP: "cw", pygame.K_x: "cw", pygame.K_z: "ccw"}
+
+def main(autoplayer=None, seed=None, record=None):
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption("Tetris")
+
+    # Game loop
+    game = Game(seed)
+    replay = Replay(game.seed) if record else None
+    game.replay = replay
+    view = BoardView(game.board)
+    if autoplayer:
+        place(autoplayer, game.piece, game.next_shape)
+        game.press("hard")
+    clock = pygame.time.Clock()
+    running = True
+    while running:
+        # Once the game is over nothing changes, so sleep until an event
+        # arrives instead of redrawing the same frame
+        events = [pygame.event.wait()] if game.game_over else pygame.event.get()
+        for event in events:
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN and event.key in key_actions and not autoplayer:
+                game.press(key_actions[event.key])
+            if event.type == pygame.KEYUP and event.key in key_actions:
+                game.release(key_actions[event.key])
+
+        locked = game.step()
+        if locked:
+            view.update(*locked)
+            if autoplayer and not game.game_over:
+                place(autoplayer, game.piece, game.next_shape)
+                game.press("hard")
+            score = game.score
+            pygame.display.set_caption(f"Tetris - {'game over - ' if game.game_over else ''}score {score.points} "
+                                       f"level {score.level} lines {score.lines}")
+
+        # Draw
+        view.draw(screen)
+        game.piece.draw(screen)
+        pygame.display.flip()
+        clock.tick(fps)
+
+    pygame.quit()
+    if autoplayer:
+        autoplayer.close()
+    if replay:
+        replay.save(record, game)
+        print(f"replay saved to {record} (seed {game.seed}, {game.frame} frames)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tetris")
+    parser.add_argument("--ai", action="store_true", help="let the autoplayer place every piece")
+    parser.add_argument("--ai-depth", type=int, default=2, help="pieces to search (1 = current, 2 = +next)")
+    parser.add_argument("--ai-beam", type=int, default=8, help="boards kept between search depths")
+    parser.add_argument("--ai-workers", type=int, default=0, help="processes for evaluating boards")
+    parser.add_argument("--bench-ai", action="store_true", help="measure placements evaluated per second")
+    parser.add_argument("--seed", type=int, default=None, help="piece sequence seed (random if omitted)")
+    parser.add_argument("--record", metavar="FILE", help="save the game's inputs as a replay on exit")
+    parser.add_argument("--replay", metavar="FILE", help="play a replay back headlessly at full speed and verify it")
+    parser.add_argument("--bench", action="store_true",
+                        help="headless engine benchmark on random input, or on --replay FILE if given")
+    parser.add_argument("--bench-frames", type=int, default=20000, help="frames of random input for --bench")
+    parser.add_argument("--json", metavar="FILE", default="-", help="where --bench writes its results")
+    args = parser.parse_args()
+    if args.record and args.ai:
+        parser.error("--record captures key input, so it can't be combined with --ai")
+    if args.bench_ai:
+        benchmark_ai()
+    elif args.bench:
+        results = json.dumps(benchmark_engine(args.bench_frames, args.seed or 0, args.replay), indent=2, sort_keys=True)
+        if args.json == "-":
+            print(results)
+        else:
+            with open(args.json, "w") as f:
+                f.write(results + "\n")
+    elif args.replay:
+        raise SystemExit(0 if run_replay(args.replay) else 1)
+    else:
+        main(Autoplayer(depth=args.ai_depth, beam_width=args.ai_beam, workers=args.ai_workers) if args.ai else None,
+             args.seed, args.record)
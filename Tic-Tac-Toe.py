@@ -1,40 +1,500 @@
 import tkinter as tk
 from tkinter import messagebox
+import argparse
+import time
+import os
+import mmap
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+# ====================== AI ======================
+# The 8 rotations/reflections of a size x size board as index maps: the
+# transformed board is [board[i] for i in symmetry]
+def board_symmetries(size):
+    rotate = [(size - 1 - i % size) * size + i // size for i in range(size * size)]
+    reflect = [i - i % size + size - 1 - i % size for i in range(size * size)]
+    found = []
+    symmetry = tuple(range(size * size))
+    for _ in range(4):
+        found.append(symmetry)
+        found.append(tuple(symmetry[i] for i in reflect))
+        symmetry = tuple(symmetry[i] for i in rotate)
+    return found
+
+# Transposition table bounds
+exact, lower, upper = 0, 1, 2
+
+# Did the stone just placed at `index` complete k in a row? Only the four
+# lines through it can have changed, and each is walked at most k - 1
+# squares either way.
+def wins_through(board, index, size, k):
+    if k <= 1:
+        return True
+    player = board[index]
+    row, col = divmod(index, size)
+    for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        count = 1
+        for sign in (1, -1):
+            r, c = row + dr * sign, col + dc * sign
+            while 0 <= r < size and 0 <= c < size and board[r * size + c] == player:
+                count += 1
+                if count >= k:
+                    return True
+                r, c = r + dr * sign, c + dc * sign
+    return False
+
+# Negamax with alpha-beta over boards written as lists of "X", "O" and ".".
+# Values are from the side to move: a win scores one more than the number
+# of empty squares left after it, so quicker wins score higher, a draw is 0.
+# Positions are stored once per symmetry class, keyed by the smallest of
+# their 8 symmetric strings.
+class Solver:
+    def __init__(self, size=3, k=3):
+        self.size = size
+        self.k = k
+        self.symmetries = board_symmetries(size)
+        self.table = {}  # canonical board -> (value, bound, best move in canonical squares)
+        self.nodes = 0
+        self.probes = 0
+        self.hits = 0
+
+    def canonical(self, board):
+        return min(("".join([board[i] for i in sym]), sym) for sym in self.symmetries)
+
+    def negamax(self, board, player, alpha, beta):
+        self.nodes += 1
+        start_alpha = alpha
+        key, sym = self.canonical(board)
+        self.probes += 1
+        entry = self.table.get(key)
+        moves = [i for i, square in enumerate(board) if square == "."]
+        if entry:
+            self.hits += 1
+            value, bound, move = entry
+            if bound == exact:
+                return value, sym[move]
+            if bound == lower:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value, sym[move]
+            # Try the stored best move first
+            moves.remove(sym[move])
+            moves.insert(0, sym[move])
+        if not moves:
+            return 0, None
+
+        opponent = "O" if player == "X" else "X"
+        best, best_move = -len(board) - 1, None
+        for i in moves:
+            board[i] = player
+            if wins_through(board, i, self.size, self.k):
+                value = len(moves)
+            else:
+                value = -self.negamax(board, opponent, -beta, -alpha)[0]
+            board[i] = "."
+            if value > best:
+                best, best_move = value, i
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+        bound = upper if best <= start_alpha else lower if best >= beta else exact
+        self.table[key] = (best, bound, sym.index(best_move))
+        return best, best_move
+
+    # Best square for `player` on a game board ("" for empty)
+    def choose(self, board, player):
+        board = [square or "." for square in board]
+        return self.negamax(board, player, -len(board) - 1, len(board) + 1)[1]
+
+    def stats(self):
+        return (f"{self.nodes} nodes, {len(self.table)} positions stored, "
+                f"table hit rate {self.hits / max(self.probes, 1):.1%}")
+
+# Solve the empty board, then time answers out of the warm table
+def benchmark_solver():
+    solver = Solver()
+    start = time.perf_counter()
+    value, move = solver.negamax(["."] * 9, "X", -10, 10)
+    elapsed = time.perf_counter() - start
+    print(f"empty board: value {value}, best square {move}, {elapsed * 1000:.1f} ms")
+    print(solver.stats())
+    nodes = solver.nodes
+    board = ["", "", "", "", "X", "", "", "", ""]
+    start = time.perf_counter()
+    for _ in range(1000):
+        solver.choose(board, "O")
+    print(f"reply to a centre opening: {(time.perf_counter() - start) * 1000:.1f} us, "
+          f"{(solver.nodes - nodes) / 1000:.1f} nodes per call")
+    if os.path.exists(table_path):
+        start = time.perf_counter()
+        table = SolutionTable()
+        opened = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(1000):
+            table.choose(board, "O")
+        print(f"solution table: opened in {opened * 1e6:.0f} us, "
+              f"reply in {(time.perf_counter() - start) * 1000:.2f} us")
+
+# ====================== SOLUTION TABLE ======================
+# Every 3x3 position solved ahead of time. A board's index is its squares as
+# base-3 digits (0 empty, 1 X, 2 O; square 0 least significant), and the
+# side to move follows from the stone counts. Each entry is one byte: the
+# best square in the high nibble (15 when the game is over) and the negamax
+# value + 8 in the low nibble. Positions that can't occur hold 0xff.
+table_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tic-tac-toe.table")
+table_magic = b"TTT1"
+no_move = 15
+unreachable = 0xff
+
+def board_index(board):
+    index = 0
+    for square in reversed(board):
+        index = index * 3 + (1 if square == "X" else 2 if square == "O" else 0)
+    return index
+
+# Every position reachable from the empty board, as (board, side to move,
+# winner or None)
+def legal_positions():
+    seen = set()
+    stack = [(["."] * 9, "X", None)]
+    while stack:
+        board, player, winner = stack.pop()
+        key = "".join(board)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield board, player, winner
+        if winner or "." not in board:
+            continue
+        for i in range(9):
+            if board[i] == ".":
+                child = board[:]
+                child[i] = player
+                stack.append((child, "O" if player == "X" else "X", player if wins_through(child, i, 3, 3) else None))
+
+def build_table(path=table_path):
+    solver = Solver()
+    entries = bytearray([unreachable]) * 3 ** 9
+    count = 0
+    for board, player, winner in legal_positions():
+        if winner:
+            # The side to move has already lost
+            value, move = -(board.count(".") + 1), no_move
+        elif "." not in board:
+            value, move = 0, no_move
+        else:
+            value, move = solver.negamax(board[:], player, -10, 10)
+        entries[board_index(board)] = move << 4 | value + 8
+        count += 1
+    with open(path, "wb") as f:
+        f.write(table_magic + entries)
+    print(f"solved {count} positions into {path} ({len(table_magic) + len(entries)} bytes)")
+
+# Same choose/stats interface as Solver, answered by one byte lookup in the
+# memory-mapped table
+class SolutionTable:
+    def __init__(self, path=table_path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(table_magic)] != table_magic or len(self.data) != len(table_magic) + 3 ** 9:
+            raise ValueError(f"{path} is not a Tic-Tac-Toe solution table")
+        self.lookups = 0
+
+    def entry(self, board):
+        self.lookups += 1
+        byte = self.data[len(table_magic) + board_index(board)]
+        if byte == unreachable:
+            raise KeyError("position can't arise in a legal game")
+        return (byte & 0xf) - 8, byte >> 4
+
+    def choose(self, board, player):
+        move = self.entry(board)[1]
+        return None if move == no_move else move
+
+    def stats(self):
+        return f"{self.lookups} table lookups"
+
+# Check every legal position in the table against a fresh live search: the
+# stored value must match, and the stored move must achieve it
+def verify_table(path=table_path):
+    table = SolutionTable(path)
+    solver = Solver()
+    checked = bad = 0
+    for board, player, winner in legal_positions():
+        value, move = table.entry(board)
+        opponent = "O" if player == "X" else "X"
+        if winner or "." not in board:
+            expected, achieved = (-(board.count(".") + 1) if winner else 0), value
+            ok = move == no_move
+        else:
+            expected = solver.negamax(board[:], player, -10, 10)[0]
+            if move >= 9 or board[move] != ".":
+                achieved = None
+            else:
+                child = board[:]
+                child[move] = player
+                achieved = (board.count(".") if wins_through(child, move, 3, 3)
+                            else -solver.negamax(child, opponent, -10, 10)[0])
+            ok = True
+        checked += 1
+        if not ok or value != expected or achieved != expected:
+            bad += 1
+            print(f"mismatch at {''.join(board)} ({player} to move): table {value}/{move}, search {expected}")
+    print(f"verified {checked} positions against live search: {bad} mismatches")
+    return bad == 0
+
+# ====================== MONTE CARLO TREE SEARCH ======================
+# For boards too big to search exhaustively. Squares are 0 empty, 1 X, 2 O
+# in a bytearray; a node's `mover` is the side whose move led to it.
+class Node:
+    __slots__ = ("move", "parent", "mover", "winner", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, parent, mover, winner=0):
+        self.move = move
+        self.parent = parent
+        self.mover = mover
+        self.winner = winner   # 0 game on, 1/2 that side has won, 3 draw
+        self.children = []
+        self.untried = None    # empty squares, listed the first time the node is reached
+        self.visits = 0
+        self.wins = 0.0        # from the point of view of `mover`; draws count half
+
+# One UCT search from `board` (game squares, "" or "." for empty) with
+# `player` to move, stopping after `playouts` playouts or `seconds`. Returns
+# ({root move: visits}, playouts run). Module level so a process pool can
+# run one search per core and the caller can merge the root visit counts.
+def mcts_search(board, player, size, k, playouts=None, seconds=None, seed=None, exploration=1.4):
+    rng = random.Random(seed)
+    start = bytearray(1 if square == "X" else 2 if square == "O" else 0 for square in board)
+    root = Node(None, None, 2 if player == "X" else 1)
+    # One scratch board for the whole search: it is reset from `start` once
+    # per playout and then played on in place, so simulated moves never copy
+    cells = bytearray(start)
+    if playouts is None and seconds is None:
+        raise ValueError("mcts_search needs a playout or time budget")
+    deadline = time.perf_counter() + seconds if seconds is not None else None
+    done = 0
+    while (playouts is None or done < playouts) and (deadline is None or done % 16 or time.perf_counter() < deadline):
+        cells[:] = start
+        node = root
+        # Selection and expansion
+        while not node.winner:
+            if node.untried is None:
+                node.untried = [i for i, square in enumerate(cells) if not square]
+            if node.untried:
+                untried = node.untried
+                j = rng.randrange(len(untried))
+                untried[j], untried[-1] = untried[-1], untried[j]
+                move = untried.pop()
+                mover = 3 - node.mover
+                cells[move] = mover
+                winner = mover if wins_through(cells, move, size, k) else 0 if 0 in cells else 3
+                child = Node(move, node, mover, winner)
+                node.children.append(child)
+                node = child
+                break
+            log_visits = math.log(node.visits)
+            node = max(node.children, key=lambda c: c.wins / c.visits + exploration * math.sqrt(log_visits / c.visits))
+            cells[node.move] = node.mover
+        # Random playout: the remaining squares in shuffled order
+        result = node.winner
+        if not result:
+            empties = [i for i, square in enumerate(cells) if not square]
+            rng.shuffle(empties)
+            mover = node.mover
+            result = 3
+            for i in empties:
+                mover = 3 - mover
+                cells[i] = mover
+                if wins_through(cells, i, size, k):
+                    result = mover
+                    break
+        # Backpropagation
+        while node:
+            node.visits += 1
+            if result == node.mover:
+                node.wins += 1
+            elif result == 3:
+                node.wins += 0.5
+            node = node.parent
+        done += 1
+    return {child.move: child.visits for child in root.children}, done
+
+# Root parallelisation: every worker grows its own tree from the same
+# position with its own seed, and the root visit counts are summed. A
+# playout budget is split between workers; a time budget applies to each.
+class MCTS:
+    def __init__(self, size, k, playouts=None, seconds=1.0, workers=1, seed=None):
+        self.size = size
+        self.k = k
+        self.playouts_budget = playouts
+        self.seconds = None if playouts is not None else seconds
+        self.workers = max(1, workers)
+        self.pool = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+        self.rng = random.Random(seed)
+        self.playouts = 0
+        self.elapsed = 0.0
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown()
+
+    def search(self, board, player):
+        board = tuple(board)
+        share = -(-self.playouts_budget // self.workers) if self.playouts_budget is not None else None
+        seeds = [self.rng.getrandbits(32) for _ in range(self.workers)]
+        args = ([board] * self.workers, [player] * self.workers, [self.size] * self.workers,
+                [self.k] * self.workers, [share] * self.workers, [self.seconds] * self.workers, seeds)
+        start = time.perf_counter()
+        results = list(self.pool.map(mcts_search, *args) if self.pool else map(mcts_search, *args))
+        self.elapsed += time.perf_counter() - start
+        visits = {}
+        for counts, done in results:
+            self.playouts += done
+            for move, count in counts.items():
+                visits[move] = visits.get(move, 0) + count
+        return visits
+
+    def choose(self, board, player):
+        visits = self.search(board, player)
+        return max(visits, key=visits.get) if visits else None
+
+    def stats(self):
+        rate = self.playouts / max(self.elapsed, 1e-9)
+        return (f"{self.playouts} playouts in {self.elapsed:.2f} s, {rate:,.0f}/s over {self.workers} "
+                f"worker{'s' if self.workers > 1 else ''} ({rate / self.workers:,.0f}/s per worker)")
+
+# Playouts per second with 1..max_workers workers on the same position, and
+# how close each is to perfect scaling of the single-worker rate
+def benchmark_mcts(size=15, k=5, seconds=2.0, max_workers=None):
+    max_workers = max_workers or os.cpu_count()
+    board = [""] * (size * size)
+    board[size * size // 2] = "X"
+    print(f"{size}x{size}, {k} in a row, {seconds:.1f} s per run, {os.cpu_count()} cores")
+    print(f"{'workers':>7} {'playouts/s':>11} {'per worker':>11} {'efficiency':>10}")
+    base = None
+    for workers in range(1, max_workers + 1):
+        engine = MCTS(size, k, seconds=seconds, workers=workers, seed=workers)
+        engine.search(board, "O")
+        engine.close()
+        rate = engine.playouts / engine.elapsed
+        base = base or rate
+        print(f"{workers:>7} {rate:>11,.0f} {rate / workers:>11,.0f} {rate / (base * workers):>10.0%}")
 
 class TicTacToe:
-    def __init__(self):
+    def __init__(self, size=3, k=3, ai=None, show_stats=False, player=None):
         self.window = tk.Tk()
-        self.window.title("Tic-Tac-Toe")
+        self.window.title(f"Tic-Tac-Toe {size}x{size}, {k} in a row")
+        self.size = size
+        self.k = k
         self.current_player = "X"
-        self.board = [""] * 9
-        self.buttons = []
+        self.board = [""] * (size * size)
+        self.moves = 0
+        self.game_over = False
+        self.ai = ai  # side the computer plays, or None for two humans
+        self.solver = player or (Solver(size, k) if ai else None)
+        self.show_stats = show_stats
 
-        for i in range(9):
-            button = tk.Button(self.window, text="", width=10, height=3, command=lambda x=i: self.button_click(x))
-            button.grid(row=i//3, column=i%3)
-            self.buttons.append(button)
+        # One canvas for the whole grid: a click is mapped to its cell, and a
+        # move draws one text item, whatever the board size
+        self.cell = max(24, min(100, 600 // size))
+        side = self.cell * size
+        self.canvas = tk.Canvas(self.window, width=side, height=side, bg="white", highlightthickness=0)
+        self.canvas.pack()
+        for i in range(1, size):
+            self.canvas.create_line(i * self.cell, 0, i * self.cell, side)
+            self.canvas.create_line(0, i * self.cell, side, i * self.cell)
+        self.canvas.bind("<Button-1>", self.canvas_click)
+        self.font = ("Helvetica", self.cell // 2, "bold")
+        if self.ai == self.current_player:
+            self.window.after(0, self.ai_move)
+
+    def canvas_click(self, event):
+        row, col = event.y // self.cell, event.x // self.cell
+        if 0 <= row < self.size and 0 <= col < self.size:
+            self.button_click(row * self.size + col)
 
     def button_click(self, index):
+        if self.game_over or self.current_player == self.ai:
+            return
+        self.play(index)
+        if not self.game_over and self.current_player == self.ai:
+            self.window.after(0, self.ai_move)
+
+    def ai_move(self):
+        start = time.perf_counter()
+        move = self.solver.choose(self.board, self.current_player)
+        if self.show_stats:
+            print(f"{self.current_player} plays {move} in {(time.perf_counter() - start) * 1e6:.0f} us; "
+                  f"{self.solver.stats()}")
+        self.play(move)
+
+    def play(self, index):
         if self.board[index] == "":
             self.board[index] = self.current_player
-            self.buttons[index].config(text=self.current_player)
-            if self.check_winner():
+            self.moves += 1
+            row, col = divmod(index, self.size)
+            self.canvas.create_text((col + 0.5) * self.cell, (row + 0.5) * self.cell, text=self.current_player,
+                                    font=self.font, fill="#c0392b" if self.current_player == "X" else "#2c3e50")
+            if self.check_winner(index):
+                self.game_over = True
                 messagebox.showinfo("Game Over", f"Player {self.current_player} wins!")
                 self.window.quit()
-            elif "" not in self.board:
+            elif self.moves == len(self.board):
+                self.game_over = True
                 messagebox.showinfo("Game Over", "It's a tie!")
                 self.window.quit()
             self.current_player = "O" if self.current_player == "X" else "X"
 
-    def check_winner(self):
-        win_conditions = [(0,1,2), (3,4,5), (6,7,8), (0,3,6), (1,4,7), (2,5,8), (0,4,8), (2,4,6)]
-        for a, b, c in win_conditions:
-            if self.board[a] == self.board[b] == self.board[c] != "":
-                return True
-        return False
+    def check_winner(self, index):
+        return wins_through(self.board, index, self.size, self.k)
 
     def run(self):
         self.window.mainloop()
+        if hasattr(self.solver, "close"):
+            self.solver.close()
 
-game = TicTacToe()
-game.run()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe")
+    parser.add_argument("--size", type=int, default=3, help="board is size x size")
+    parser.add_argument("--k", type=int, default=None, help="stones in a row to win (default: size, max 5)")
+    parser.add_argument("--ai", choices=["X", "O"], default=None, help="side the computer plays")
+    parser.add_argument("--stats", action="store_true", help="print search counters after each computer move")
+    parser.add_argument("--bench", action="store_true", help="solve the empty board and time warm replies")
+    parser.add_argument("--build-table", action="store_true", help="solve every 3x3 position and write the table")
+    parser.add_argument("--verify-table", action="store_true", help="cross-check the table against live search")
+    parser.add_argument("--table", default=table_path, help="solution table file")
+    parser.add_argument("--playouts", type=int, default=None, help="MCTS playouts per move (instead of --seconds)")
+    parser.add_argument("--seconds", type=float, default=1.0, help="MCTS thinking time per move")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="MCTS processes (root parallel)")
+    parser.add_argument("--bench-mcts", action="store_true",
+                        help="MCTS playouts/s and scaling from 1 to --workers processes on a --size board")
+    args = parser.parse_args()
+    k = args.k or min(args.size, 5)
+    if not 1 <= k <= args.size:
+        parser.error("--k must be between 1 and --size")
+    if args.seconds <= 0:
+        parser.error("--seconds must be positive")
+    if args.playouts is not None and args.playouts <= 0:
+        parser.error("--playouts must be positive")
+    if args.bench:
+        benchmark_solver()
+    elif args.bench_mcts:
+        benchmark_mcts(args.size, k, args.seconds, args.workers)
+    elif args.build_table:
+        build_table(args.table)
+    elif args.verify_table:
+        raise SystemExit(0 if verify_table(args.table) else 1)
+    else:
+        # A 3x3 opponent plays straight out of the table when it has been
+        # built, small boards are searched exhaustively, bigger ones by MCTS
+        player = None
+        if args.ai and args.size == 3 and k == 3 and os.path.exists(args.table):
+            player = SolutionTable(args.table)
+        elif args.ai and args.size > 3:
+            player = MCTS(args.size, k, args.playouts, args.seconds, args.workers)
+        game = TicTacToe(args.size, k, args.ai, args.stats, player)
+        game.run()
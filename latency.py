@@ -0,0 +1,63 @@
+"""
+Input-to-photon latency probe shared by the pygame games.
+
+Key events are timestamped when the game pulls them off the event queue,
+tagged with the simulation step that first runs after them, and closed
+when display.flip() returns for the frame that step was drawn in.
+"""
+
+import time
+import pygame
+
+
+class LatencyProbe:
+    def __init__(self, keys=None):
+        self.keys = keys          # only these keys count; None for every key
+        self.pending = []         # input times not yet seen by a simulation step
+        self.in_flight = []       # (input time, step) waiting for the next flip
+        self.samples = []         # (latency in seconds, step)
+
+    def on_event(self, event):
+        if event.type in (pygame.KEYDOWN, pygame.KEYUP) and (self.keys is None or event.key in self.keys):
+            self.pending.append(time.perf_counter())
+
+    # Call when a simulation step runs; it consumes every input seen so far
+    def consume(self, step):
+        if self.pending:
+            self.in_flight.extend((t, step) for t in self.pending)
+            self.pending.clear()
+
+    # Call right after display.flip() returns
+    def presented(self):
+        if self.in_flight:
+            now = time.perf_counter()
+            self.samples.extend((now - t, step) for t, step in self.in_flight)
+            self.in_flight.clear()
+
+    def percentile(self, p):
+        ordered = sorted(latency for latency, _ in self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def report(self, bucket_ms=4, width=40):
+        if not self.samples:
+            return "input latency: no samples"
+        lines = [f"input latency over {len(self.samples)} inputs: "
+                 f"p50 {self.percentile(50) * 1000:.1f} ms, "
+                 f"p95 {self.percentile(95) * 1000:.1f} ms, "
+                 f"p99 {self.percentile(99) * 1000:.1f} ms, "
+                 f"max {max(latency for latency, _ in self.samples) * 1000:.1f} ms"]
+        counts = {}
+        for latency, _ in self.samples:
+            bucket = int(latency * 1000 // bucket_ms)
+            counts[bucket] = counts.get(bucket, 0) + 1
+        # Buckets run up to p99; anything slower is lumped into one last line
+        last = int(self.percentile(99) * 1000 // bucket_ms)
+        tail = sum(count for bucket, count in counts.items() if bucket > last)
+        peak = max(max(counts.values()), tail)
+        for bucket in range(last + 1):
+            count = counts.get(bucket, 0)
+            lines.append(f"{bucket * bucket_ms:>5}-{(bucket + 1) * bucket_ms:<4} ms "
+                         f"{'#' * round(count / peak * width):<{width}} {count}")
+        if tail:
+            lines.append(f"{'>' + str((last + 1) * bucket_ms):>10} ms {'#' * round(tail / peak * width):<{width}} {tail}")
+        return "\n".join(lines)
@@ -5,8 +5,10 @@ Pygame | Local Multiplayer | Clickable RESTART
 
 import pygame
 import math
+import argparse
 import random
 from dataclasses import dataclass
+from latency import LatencyProbe
 from typing import Tuple
 
 pygame.init()
@@ -42,6 +44,9 @@ class Config:
     WIN_SCORE: int = 11
     FONT_NAME: str = "consolas"
 
+    # Instrumentation
+    INPUT_LATENCY: bool = False
+
 config = Config()
 
 # ====================== BUTTON CLASS ======================
@@ -150,6 +155,7 @@ class Game:
         self.screen = pygame.display.set_mode((config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
         pygame.display.set_caption(config.TITLE)
         self.clock = pygame.time.Clock()
+        self.latency = LatencyProbe({pygame.K_w, pygame.K_s, pygame.K_UP, pygame.K_DOWN}) if config.INPUT_LATENCY else None
         self.font_big = pygame.font.SysFont(config.FONT_NAME, 72, bold=True)
         self.font_small = pygame.font.SysFont(config.FONT_NAME, 36)
         self.reset()
@@ -175,6 +181,8 @@ class Game:
     def handle_events(self):
         mouse_pos = pygame.mouse.get_pos()
         for event in pygame.event.get():
+            if self.latency:
+                self.latency.on_event(event)
             if event.type == pygame.QUIT:
                 return False
             if event.type == pygame.MOUSEBUTTONDOWN and self.winner:
@@ -250,13 +258,24 @@ class Game:
 
     def run(self):
         running = True
+        frame = 0
         while running:
             running = self.handle_events()
             self.update()
+            frame += 1
+            if self.latency:
+                self.latency.consume(frame)
             self.draw()
+            if self.latency:
+                self.latency.presented()
             self.clock.tick(config.FPS)
         pygame.quit()
+        if self.latency:
+            print(self.latency.report())
 
 # ====================== RUN ======================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=config.TITLE)
+    parser.add_argument("--input-latency", action="store_true", help="print input-to-photon latency on exit")
+    config.INPUT_LATENCY = parser.parse_args().input_latency
     Game().run()
@@ -5,7 +5,9 @@ With Clickable RESTART Button
 
 import pygame
 import math
+import argparse
 from dataclasses import dataclass
+from latency import LatencyProbe
 from typing import List, Tuple
 
 pygame.init()
@@ -34,6 +36,9 @@ class Config:
 
     START_LIVES: int = 3
 
+    # Instrumentation
+    INPUT_LATENCY: bool = False
+
 config = Config()
 
 # ====================== BUTTON CLASS ======================
@@ -143,6 +148,9 @@ class Game:
         self.screen = pygame.display.set_mode((config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
         pygame.display.set_caption(config.TITLE)
         self.clock = pygame.time.Clock()
+        controls = {pygame.K_w, pygame.K_s, pygame.K_a, pygame.K_d, pygame.K_f,
+                    pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_RETURN}
+        self.latency = LatencyProbe(controls) if config.INPUT_LATENCY else None
         self.font = pygame.font.SysFont("arial", 40, bold=True)
         self.small_font = pygame.font.SysFont("arial", 28, bold=True)
         self.button_font = pygame.font.SysFont("arial", 32, bold=True)
@@ -176,6 +184,8 @@ class Game:
     def handle_events(self):
         mouse_pos = pygame.mouse.get_pos()
         for event in pygame.event.get():
+            if self.latency:
+                self.latency.on_event(event)
             if event.type == pygame.QUIT:
                 return False
             if event.type == pygame.MOUSEBUTTONDOWN and self.winner:
@@ -258,14 +268,25 @@ class Game:
 
     def run(self):
         running = True
+        frame = 0
         while running:
             running = self.handle_events()
             self.update()
+            frame += 1
+            if self.latency:
+                self.latency.consume(frame)
             self.draw()
+            if self.latency:
+                self.latency.presented()
             self.clock.tick(config.FPS)
         pygame.quit()
+        if self.latency:
+            print(self.latency.report())
 
 # ====================== RUN ======================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=config.TITLE)
+    parser.add_argument("--input-latency", action="store_true", help="print input-to-photon latency on exit")
+    config.INPUT_LATENCY = parser.parse_args().input_latency
     game = Game()
     game.run()